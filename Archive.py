@@ -0,0 +1,268 @@
+#!/usr/bin/python
+
+import os
+import zlib
+import mmap
+import sqlite3
+import tempfile
+import contextlib
+
+# Stores opened for reading in this process, so pool workers open each store once
+Readers = {}
+
+class Folder():
+	'''
+	A directory of structure files behind the same interface as
+	Archive, so every stage can work on either one. Keys are the
+	file names without the .pdb extension (PDBID_chain)
+	'''
+	def __init__(self, directory, readonly=False):
+		self.directory = os.path.abspath(directory)
+		if not readonly:
+			os.makedirs(self.directory, exist_ok=True)
+
+	def File(self, key):
+		''' The path of a key's file '''
+		return(os.path.join(self.directory, key + '.pdb'))
+
+	def Keys(self):
+		''' Every stored key, sorted '''
+		return(sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith('.pdb')))
+
+	def Read(self, key):
+		''' The content of one structure as bytes '''
+		with open(self.File(key), 'rb') as TheFile:
+			return(TheFile.read())
+
+	def Write(self, key, data):
+		''' Store one structure, replacing any older version atomically '''
+		if isinstance(data, str):
+			data = data.encode()
+		temp = '{}.{}.tmp'.format(self.File(key), os.getpid())
+		with open(temp, 'wb') as TheFile:
+			TheFile.write(data)
+		os.replace(temp, self.File(key))
+
+	def Remove(self, key):
+		''' Delete one structure '''
+		os.remove(self.File(key))
+
+	def Path(self, key):
+		''' A file path holding the structure, the file itself '''
+		return(self.File(key))
+
+	def Release(self, path):
+		''' Nothing to clean up for a directory '''
+		pass
+
+	def Close(self):
+		pass
+
+class Archive():
+	'''
+	A packed structure archive. Structure files are appended
+	(optionally zlib compressed) to large segment files, and an
+	SQLite index maps each PDBID_chain key to its segment, offset,
+	and length. Reads are memory-mapped slices of the segments,
+	deletes only add the key to a tombstone list, and Compact()
+	rewrites the live structures into new segments and drops the
+	deleted ones. Only one process should write to an archive, any
+	number of processes can read from it
+	'''
+	def __init__(self, path, compress=False, segment=1 << 30, readonly=False):
+		self.path = os.path.abspath(path)
+		self.compress = compress
+		self.segment = segment
+		self.readonly = readonly
+		self.maps = {}
+		self.active = None
+		self.pending = 0
+		if readonly:
+			self.db = sqlite3.connect('file:{}?mode=ro'.format(os.path.join(self.path, 'index.db')), uri=True)
+			return
+		os.makedirs(self.path, exist_ok=True)
+		self.db = sqlite3.connect(os.path.join(self.path, 'index.db'))
+		self.db.execute('PRAGMA journal_mode=WAL')
+		self.db.execute('PRAGMA synchronous=NORMAL')
+		self.db.execute('CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, segment INTEGER, offset INTEGER, length INTEGER, compressed INTEGER)')
+		self.db.execute('CREATE TABLE IF NOT EXISTS tombstones (key TEXT PRIMARY KEY)')
+		self.db.commit()
+
+	def __enter__(self):
+		return(self)
+
+	def __exit__(self, *error):
+		self.Close()
+
+	def Segment(self, number):
+		''' The file name of a segment '''
+		return(os.path.join(self.path, 'segment-{:05d}'.format(number)))
+
+	def Keys(self):
+		''' Every live key, sorted '''
+		return([row[0] for row in self.db.execute('SELECT key FROM records WHERE key NOT IN (SELECT key FROM tombstones) ORDER BY key')])
+
+	def Map(self, number, end):
+		''' A memory map of a segment that covers at least end bytes '''
+		if number not in self.maps or len(self.maps[number]) < end:
+			if number in self.maps:
+				self.maps[number].close()
+			if self.active is not None and self.active[0] == number:
+				self.active[1].flush()
+			with open(self.Segment(number), 'rb') as TheFile:
+				self.maps[number] = mmap.mmap(TheFile.fileno(), 0, access=mmap.ACCESS_READ)
+		return(self.maps[number])
+
+	def Read(self, key):
+		''' The content of one structure as bytes '''
+		row = self.db.execute('SELECT segment, offset, length, compressed FROM records WHERE key=? AND key NOT IN (SELECT key FROM tombstones)', (key,)).fetchone()
+		if row is None:
+			raise KeyError(key)
+		number, offset, length, compressed = row
+		if length == 0:
+			return(b'')
+		data = self.Map(number, offset + length)[offset:offset + length]
+		return(zlib.decompress(data) if compressed else data)
+
+	def Write(self, key, data):
+		''' Append one structure to the active segment and point its key at it, replacing any older version '''
+		if isinstance(data, str):
+			data = data.encode()
+		if self.compress:
+			data = zlib.compress(data, 6)
+		if self.active is None or self.active[1].tell() + len(data) > self.segment:
+			if self.active is not None:
+				self.active[1].close()
+			numbers = [int(name.split('-')[1]) for name in os.listdir(self.path) if name.startswith('segment-')]
+			number = max(numbers, default=0)
+			if self.active is not None or (os.path.exists(self.Segment(number)) and os.path.getsize(self.Segment(number)) + len(data) > self.segment):
+				number += 1
+			self.active = (number, open(self.Segment(number), 'ab'))
+		number, TheFile = self.active
+		offset = TheFile.tell()
+		TheFile.write(data)
+		self.db.execute('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)', (key, number, offset, len(data), int(self.compress)))
+		self.db.execute('DELETE FROM tombstones WHERE key=?', (key,))
+		self.pending += 1
+		if self.pending >= 1024:
+			self.Flush()
+
+	def Remove(self, key):
+		''' Logically delete one structure by adding it to the tombstone list '''
+		self.db.execute('INSERT OR IGNORE INTO tombstones VALUES (?)', (key,))
+		self.pending += 1
+		if self.pending >= 1024:
+			self.Flush()
+
+	def Flush(self):
+		''' Make all writes durable and visible to other processes '''
+		if self.active is not None:
+			self.active[1].flush()
+			os.fsync(self.active[1].fileno())
+		if not self.readonly:
+			self.db.commit()
+		self.pending = 0
+
+	def Path(self, key):
+		''' Materialize one structure as a temporary file, for the tools that can only read files '''
+		descriptor, path = tempfile.mkstemp(prefix=key + '-', suffix='.pdb')
+		with os.fdopen(descriptor, 'wb') as TheFile:
+			TheFile.write(self.Read(key))
+		return(path)
+
+	def Release(self, path):
+		''' Delete a file made by Path() '''
+		os.remove(path)
+
+	def Compact(self):
+		'''
+		Rewrite the live structures into new segments, then drop the
+		tombstones and delete the old segments to reclaim their space
+		'''
+		self.Flush()
+		if self.active is not None:
+			self.active[1].close()
+			self.active = None
+		old = sorted({row[0] for row in self.db.execute('SELECT segment FROM records')})
+		first = (old[-1] + 1) if old != [] else 0
+		number, size, TheFile = first, 0, open(self.Segment(first), 'wb')
+		moved = []
+		for key, segment, offset, length, compressed in self.db.execute('SELECT * FROM records WHERE key NOT IN (SELECT key FROM tombstones) ORDER BY segment, offset').fetchall():
+			if length == 0:
+				moved.append((number, size, key))
+				continue
+			if size + length > self.segment and size > 0:
+				TheFile.close()
+				number, size, TheFile = number + 1, 0, open(self.Segment(number + 1), 'wb')
+			TheFile.write(self.Map(segment, offset + length)[offset:offset + length])
+			moved.append((number, size, key))
+			size += length
+		TheFile.flush()
+		os.fsync(TheFile.fileno())
+		TheFile.close()
+		with self.db:
+			self.db.executemany('UPDATE records SET segment=?, offset=? WHERE key=?', moved)
+			self.db.execute('DELETE FROM records WHERE key IN (SELECT key FROM tombstones)')
+			self.db.execute('DELETE FROM tombstones')
+		for mapped in self.maps.values():
+			mapped.close()
+		self.maps = {}
+		for segment in old:
+			os.remove(self.Segment(segment))
+
+	def Close(self):
+		''' Flush and close the archive '''
+		if self.db is None:
+			return
+		self.Flush()
+		if self.active is not None:
+			self.active[1].close()
+			self.active = None
+		for mapped in self.maps.values():
+			mapped.close()
+		self.maps = {}
+		self.db.close()
+		self.db = None
+
+def IsArchive(location):
+	''' Whether a location is a packed archive rather than a directory of files '''
+	return(location.endswith('.archive') or os.path.exists(os.path.join(location, 'index.db')))
+
+def Open(location, compress=False):
+	''' Open a store for writing, an Archive for .archive locations, otherwise a Folder '''
+	if IsArchive(location):
+		return(Archive(location, compress=compress))
+	return(Folder(location))
+
+def Reader(location):
+	''' A read-only store for this process, opened once and reused '''
+	location = os.path.abspath(location)
+	key = (os.getpid(), location)										#Never share a connection with a forked parent
+	if key not in Readers:
+		Readers[key] = Archive(location, readonly=True) if IsArchive(location) else Folder(location, readonly=True)
+	return(Readers[key])
+
+@contextlib.contextmanager
+def Local(location, key):
+	''' A file path holding one structure for the length of a with block '''
+	store = Reader(location)
+	path = store.Path(key)
+	try:
+		yield(path)
+	finally:
+		store.Release(path)
+
+def Pack(directory, location, compress=True):
+	''' Pack every structure file of a directory into an archive '''
+	with Archive(location, compress=compress) as archive:
+		source = Folder(directory, readonly=True)
+		for key in source.Keys():
+			archive.Write(key, source.Read(key))
+
+def Unpack(location, directory):
+	''' Write every live structure of an archive back to a directory of files '''
+	archive = Archive(location, readonly=True)
+	target = Folder(directory)
+	for key in archive.Keys():
+		target.Write(key, archive.Read(key))
+	archive.Close()
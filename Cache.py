@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+import Bio.PDB
+import Secondary
+
+# Location and maximum size (in bytes) of the on-disk DSSP cache
+Directory = os.environ.get('PROTAI_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ProtAI', 'dssp'))
+Limit = int(os.environ.get('PROTAI_CACHE_SIZE', 2 * 1024 ** 3))
+# Check the cache size after this many new entries
+EvictEvery = 256
+# Default DSSP engine, mkdssp or numpy (in-process, see Secondary.py, not yet validated against mkdssp on real chains)
+Engine = os.environ.get('PROTAI_DSSP', 'mkdssp')
+
+CurrentVersion = None
+Writes = 0
+
+def Version(engine=None):
+	'''
+	Return the version string of a DSSP engine, the installed mkdssp
+	executable or the in-process engine. Cached entries are stored
+	under this version, so upgrading DSSP invalidates every entry
+	that was computed by the older one
+	'''
+	global CurrentVersion
+	if (engine or Engine) == 'numpy':
+		return(Secondary.Version)
+	if CurrentVersion is not None:
+		return(CurrentVersion)
+	CurrentVersion = 'unknown'
+	for executable in ('mkdssp', 'dssp'):
+		try:
+			output = subprocess.run([executable, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True).stdout
+		except OSError:
+			continue
+		line = output.strip().split('\n')[0]
+		CurrentVersion = '{}-{}'.format(executable, ''.join(c if c.isalnum() or c in '.-' else '_' for c in line))
+		break
+	return(CurrentVersion)
+
+def Location(engine=None):
+	'''
+	Return the cache directory of the current version of a DSSP
+	engine, and delete the directories of the engine's other versions
+	'''
+	version = Version(engine)
+	path = os.path.join(Directory, version)
+	if not os.path.isdir(path):
+		os.makedirs(path, exist_ok=True)
+		for stale in os.listdir(Directory):
+			if stale != version and stale.startswith('numpy-') == version.startswith('numpy-'):
+				shutil.rmtree(os.path.join(Directory, stale), ignore_errors=True)
+	return(path)
+
+def Key(filename, acc_array):
+	''' Hash a structure file's content together with the ASA table '''
+	digest = hashlib.sha1(acc_array.encode())
+	with open(filename, 'rb') as TheFile:
+		for block in iter(lambda: TheFile.read(1 << 20), b''):
+			digest.update(block)
+	return(digest.hexdigest())
+
+def DSSP(filename, acc_array='Wilke', engine=None):
+	'''
+	Drop-in replacement for Bio.PDB.DSSP on the first model of a
+	structure file. Returns a list of (residue number, amino acid,
+	secondary structure, relative ASA, phi, psi) tuples, running
+	the engine only if this exact file content has not been seen
+	before
+	'''
+	global Writes
+	engine = engine or Engine
+	key = Key(filename, acc_array)
+	path = os.path.join(Location(engine), key[:2], key + '.json')
+	try:
+		with open(path, 'r') as entry:
+			residues = [tuple(aa) for aa in json.load(entry)]
+		os.utime(path)												#Mark as recently used
+		return(residues)
+	except (OSError, ValueError):
+		pass
+	if engine == 'numpy':
+		residues = Secondary.DSSP(filename, acc_array)
+	else:
+		structure = Bio.PDB.PDBParser(QUIET=True).get_structure('X', filename)
+		dssp = Bio.PDB.DSSP(structure[0], filename, acc_array=acc_array)
+		residues = [tuple(aa[:6]) for aa in dssp]
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temp = '{}.{}.tmp'.format(path, os.getpid())
+	with open(temp, 'w') as entry:
+		json.dump(residues, entry)
+	os.replace(temp, path)											#Atomic, so parallel workers never read half an entry
+	Writes += 1
+	if Writes % EvictEvery == 0:
+		Evict()
+	return(residues)
+
+def Evict(limit=None):
+	'''
+	Delete the least recently used entries until the cache is
+	below 90% of its size limit
+	'''
+	if limit is None:
+		limit = Limit
+	entries = []
+	total = 0
+	for root, dirs, files in os.walk(Directory):
+		for name in files:
+			path = os.path.join(root, name)
+			try:
+				stat = os.stat(path)
+			except OSError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, path))
+			total += stat.st_size
+	if total <= limit:
+		return
+	entries.sort()
+	for mtime, size, path in entries:
+		if total <= 0.9 * limit:
+			break
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+		total -= size
+
+def Clear():
+	''' Delete every cached entry of every DSSP version '''
+	global CurrentVersion
+	shutil.rmtree(Directory, ignore_errors=True)
+	CurrentVersion = None
@@ -0,0 +1,46 @@
+#!/usr/bin/python
+
+import io
+import json
+import socket
+import http.client
+import numpy as np
+
+class UnixConnection(http.client.HTTPConnection):
+	''' An HTTP connection over a Unix socket '''
+	def __init__(self, path, timeout=None):
+		super().__init__('localhost', timeout=timeout)
+		self.socket_path = path
+
+	def connect(self):
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.sock.settimeout(self.timeout)
+		self.sock.connect(self.socket_path)
+
+def Connect(address, timeout=None):
+	''' A connection to the service, a host:port or the path of a Unix socket '''
+	if ':' in address:
+		host, port = address.rsplit(':', 1)
+		return(http.client.HTTPConnection(host, int(port), timeout=timeout))
+	return(UnixConnection(address, timeout))
+
+def Call(address, kind, n=1, seed=None, timeout=None):
+	''' Send one request to the service started by Generate.py --serve, returns the response body '''
+	connection = Connect(address, timeout)
+	try:
+		connection.request('POST', '/' + kind, json.dumps({'n':n, 'seed':seed}), {'Content-Type':'application/json'})
+		response = connection.getresponse()
+		body = response.read()
+		if response.status != 200:
+			raise RuntimeError('{} {}'.format(response.status, response.reason))
+		return(body)
+	finally:
+		connection.close()
+
+def Generate(address, n=1, seed=None, timeout=None):
+	''' Generate n samples, returns the (n, 150, channels) float32 array in degrees and Å '''
+	return(np.load(io.BytesIO(Call(address, 'generate', n, seed, timeout))))
+
+def Fold(address, n=1, seed=None, timeout=None):
+	''' Generate and fold n samples, returns the paths of their backbone structures (None for samples that failed the pre-fold screen) '''
+	return(json.loads(Call(address, 'fold', n, seed, timeout))['paths'])
@@ -0,0 +1,334 @@
+#!/usr/bin/python
+
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+
+class Writer():
+	'''
+	A single buffered writer for the fixed shape datasets. Each row
+	is zero padded to the dataset's shape and the rows are stored as
+	one float32 (examples, residues, channels) .npy file that can be
+	memory-mapped, next to a .index.npz file that holds each row's
+	PDB_ID and length. The semicolon separated CSV is optional.
+	Text datasets (sequences, secondary structures) are stored as
+	uint8 character codes
+	'''
+	def __init__(self, filename, shape, header=None, CSV=False, text=False, decimals=None, buffer=1024):
+		self.filename = filename
+		self.header = header
+		self.shape = tuple(shape)
+		self.text = text
+		self.dtype = np.uint8 if text else np.float32
+		self.decimals = decimals
+		self.buffer = buffer
+		self.rows = []
+		self.IDs = []
+		self.lengths = []
+		self.skipped = 0
+		self.raw = open(filename + '.raw', 'wb')
+		self.csv = None
+		if CSV:
+			self.csv = open(filename + '.csv', 'w', buffering=1 << 20)
+			if header is not None:
+				self.csv.write(header)
+
+	def __enter__(self):
+		return(self)
+
+	def __exit__(self, *error):
+		self.Close()
+
+	def Format(self, value):
+		''' Format one value for the CSV file '''
+		if self.decimals is None:
+			return(str(value))
+		return(str(round(value, self.decimals)))
+
+	def Add(self, ID, values):
+		'''
+		Add one row, values is either a string (text datasets) or a
+		list of per-residue values or per-residue lists of channels.
+		Rows longer than the dataset's shape are skipped. Returns
+		whether the row was added
+		'''
+		length = len(values)
+		if length > self.shape[0]:
+			self.skipped += 1
+			return(False)
+		row = np.zeros(self.shape, dtype=self.dtype)
+		if self.text:
+			row[:length] = np.frombuffer(values.encode(), dtype=np.uint8)
+		elif length > 0:
+			row[:length] = np.asarray(values, dtype=np.float32).reshape((length,) + self.shape[1:])
+		self.rows.append(row)
+		self.IDs.append(ID)
+		self.lengths.append(length)
+		if self.csv is not None:
+			if self.text:
+				self.csv.write(ID + ';' + values + '\n')
+			else:
+				flat = np.zeros(self.shape).reshape(len(row), -1).tolist()
+				flat[:length] = [item if isinstance(item, (list, tuple)) else [item] for item in values]
+				line = ';'.join(self.Format(value) for item in flat for value in item)
+				self.csv.write(str(len(self.IDs)) + ';' + ID + ';' + line + '\n')
+		if len(self.rows) >= self.buffer:
+			self.Flush()
+		return(True)
+
+	def Flush(self):
+		''' Write the buffered rows to disk '''
+		if self.rows != []:
+			np.stack(self.rows).tofile(self.raw)
+			self.rows = []
+
+	def Close(self):
+		''' Write the .npy header and the index, and close all files '''
+		if self.raw is None:
+			return
+		self.Flush()
+		self.raw.close()
+		self.raw = None
+		with open(self.filename + '.npy', 'wb') as array:
+			np.lib.format.write_array_header_1_0(array, {'descr':np.lib.format.dtype_to_descr(np.dtype(self.dtype)), 'fortran_order':False, 'shape':(len(self.IDs),) + self.shape})
+			with open(self.filename + '.raw', 'rb') as raw:
+				for block in iter(lambda: raw.read(1 << 24), b''):
+					array.write(block)
+		os.remove(self.filename + '.raw')
+		np.savez(self.filename + '.index.npz', PDB_ID=np.array(self.IDs, dtype=str), Length=np.array(self.lengths, dtype=np.int32))
+		if self.csv is not None:
+			self.csv.close()
+		if self.skipped > 0:
+			print('\x1b[33m' + 'Skipped {} structures longer than {} amino acids'.format(self.skipped, self.shape[0]) + '\x1b[0m')
+		Statistics(self.filename, self.shape[0], names=Names(self.header, self.shape[1] if len(self.shape) > 1 else 1))
+
+def Load(filename, mmap=True):
+	'''
+	Load a dataset written by Writer, filename is either the .npy
+	file or its name without the extension. Returns the array
+	(memory-mapped, no parsing), the PDB_IDs, and the lengths
+	'''
+	if filename.endswith('.npy'):
+		filename = filename[:-4]
+	X = np.load(filename + '.npy', mmap_mode='r' if mmap else None)
+	index = np.load(filename + '.index.npz')
+	return(X, index['PDB_ID'], index['Length'])
+
+def Merge(filename, addition=None, remove=()):
+	'''
+	Update a dataset in place without rebuilding it. Rows whose
+	PDB_ID starts with any of the remove prefixes are dropped, then
+	the rows of the addition dataset (if any) are appended. The
+	arrays are copied in chunks into temporary files that replace
+	the old ones atomically, so a crash leaves the old dataset
+	intact. The optional CSV file is not updated
+	'''
+	if filename.endswith('.npy'):
+		filename = filename[:-4]
+	remove = tuple(remove)
+	parts = []
+	for name in (filename, addition):
+		if name is None or not os.path.exists(name + '.npy'):
+			continue
+		X, IDs, lengths = Load(name)
+		keep = np.ones(len(IDs), dtype=bool)
+		if name == filename and remove != ():
+			keep = np.array([not ID.startswith(remove) for ID in IDs.tolist()], dtype=bool)
+		parts.append((X, IDs, lengths, np.flatnonzero(keep)))
+	if parts == []:
+		return
+	shape = parts[0][0].shape[1:]
+	dtype = parts[0][0].dtype
+	total = sum(len(rows) for X, IDs, lengths, rows in parts)
+	merged = np.lib.format.open_memmap(filename + '.tmp.npy', mode='w+', dtype=dtype, shape=(total,) + shape)
+	start = 0
+	for X, IDs, lengths, rows in parts:
+		for chunk in range(0, len(rows), 4096):
+			block = rows[chunk:chunk + 4096]
+			merged[start:start + len(block)] = X[block]
+			start += len(block)
+	merged.flush()
+	del merged
+	np.savez(filename + '.tmp.index.npz', PDB_ID=np.concatenate([IDs[rows] for X, IDs, lengths, rows in parts]).astype(str), Length=np.concatenate([lengths[rows] for X, IDs, lengths, rows in parts]).astype(np.int32))
+	os.replace(filename + '.tmp.npy', filename + '.npy')
+	os.replace(filename + '.tmp.index.npz', filename + '.index.npz')
+	Statistics(filename, shape[0])
+
+def Source(filename):
+	''' The name without the extension and the data file of a dataset given as a .npy or .csv file or a bare name '''
+	if filename.endswith('.csv'):
+		return(filename[:-4], filename)
+	base = filename[:-4] if filename.endswith('.npy') else filename
+	return(base, base + '.npy')
+
+def Channels(filename, residues=150):
+	''' The number of channels of a semicolon separated CSV dataset, from its header '''
+	with open(filename, 'r') as TheFile:
+		return(max((len(TheFile.readline().rstrip('\n').split(';')) - 2) // residues, 1))
+
+def Names(header, channels):
+	''' The name of each channel of a dataset (phi, psi, cst, ...) from its CSV header, None without a header '''
+	if header is None:
+		return(None)
+	return([field.rsplit('_', 1)[0] for field in header.strip().split(';')[2:2 + channels]])
+
+def Rows(filename, channels, residues=150, chunk=4096):
+	'''
+	Read a semicolon separated CSV dataset (example number, PDB_ID,
+	then the channels of each residue) in chunks, yields the IDs,
+	the float32 (rows, residues, channels) values, and the lengths
+	of each chunk. A row's length is the position of its last
+	residue that is not zero padding
+	'''
+	with open(filename, 'r') as TheFile:
+		next(TheFile)
+		while True:
+			lines = list(itertools.islice(TheFile, chunk))
+			if lines == []:
+				break
+			block = np.loadtxt(lines, delimiter=';', usecols=range(2, 2 + residues * channels), dtype=np.float32, ndmin=2)
+			block = block.reshape(len(lines), residues, channels)
+			filled = np.any(block != 0, axis=2)
+			lengths = np.where(filled.any(axis=1), residues - np.argmax(filled[:, ::-1], axis=1), 0).astype(np.int32)
+			yield([line.split(';', 2)[1] for line in lines], block, lengths)
+
+def Training(filename, scale, residues=150, chunk=4096):
+	'''
+	The training tensor of a dataset, a contiguous float32
+	(examples, residues, channels) .npy file with every channel
+	already divided by its scale, memory-mapped so it is never held
+	in memory as a whole. filename is either a dataset written by
+	Writer or a semicolon separated CSV (example number, PDB_ID,
+	then the channels of each residue). It is converted once, in
+	chunks, to filename.train.npy and reused until the source file
+	or the scale changes
+	'''
+	scale = np.asarray(scale, dtype=np.float32)
+	channels = len(scale)
+	base, source = Source(filename)
+	target = base + '.train'
+	if os.path.exists(target + '.npy') and os.path.getmtime(target + '.npy') >= os.path.getmtime(source):
+		index = np.load(target + '.index.npz')
+		if 'Scale' in index and np.array_equal(index['Scale'], scale):
+			return(np.load(target + '.npy', mmap_mode='r'))
+	if source.endswith('.csv'):
+		examples = Statistics(source)['rows']
+	else:
+		X, IDs, lengths = Load(source)
+		examples = len(X)
+	out = np.lib.format.open_memmap(target + '.tmp.npy', mode='w+', dtype=np.float32, shape=(examples, residues, channels))
+	if source.endswith('.csv'):
+		IDs, lengths = [], []
+		start = 0
+		for names, block, sizes in Rows(source, channels, residues, chunk):
+			out[start:start + len(block)] = block / scale
+			IDs.extend(names)
+			lengths.append(sizes)
+			start += len(block)
+		IDs, lengths = np.array(IDs, dtype=str), np.concatenate(lengths) if lengths != [] else np.zeros(0, dtype=np.int32)
+	else:
+		for start in range(0, examples, chunk):
+			out[start:start + chunk] = X[start:start + chunk, :residues, :channels] / scale
+	out.flush()
+	del out
+	np.savez(target + '.tmp.index.npz', PDB_ID=IDs, Length=lengths, Scale=scale)
+	os.replace(target + '.tmp.npy', target + '.npy')
+	os.replace(target + '.tmp.index.npz', target + '.index.npz')
+	return(np.load(target + '.npy', mmap_mode='r'))
+
+def Minibatch(X, size, rng=None):
+	'''
+	A random minibatch of a memory-mapped training tensor, only the
+	drawn rows are read (in file order) from the disk
+	'''
+	rows = rng.integers(0, len(X), size=size) if rng is not None else np.random.randint(0, len(X), size=size)
+	return(np.asarray(X[np.sort(rows)]))
+
+def Hash(filename):
+	''' The SHA-256 of a file, read in blocks '''
+	digest = hashlib.sha256()
+	with open(filename, 'rb') as TheFile:
+		for block in iter(lambda: TheFile.read(1 << 24), b''):
+			digest.update(block)
+	return(digest.hexdigest())
+
+def Statistics(filename, residues=150, chunk=4096, names=None):
+	'''
+	The statistics of a dataset (.npy or .csv), kept in a sidecar
+	named after the data file (dataPSC.npy.stats.json or
+	dataPSC.csv.stats.json, so the two formats of one dataset never
+	overwrite each other's): the number of rows and channels,
+	each channel's min, max, and mean over the real residues (not
+	the zero padding), the channel names, the constraint maximum
+	(only for the phi, psi, cst layout of the PSC dataset, None for
+	every other layout), and the min, max, mean, and count of each
+	row length. The names come from a CSV file's header, or are given
+	by the Writer of a .npy file and kept in its sidecar. The sidecar is trusted while the data file's size and
+	modification time are unchanged, then checked against the
+	file's hash, and only recomputed (in one chunked pass) when the
+	content changed. Without the data file the sidecar is used as is
+	'''
+	base, source = Source(filename)
+	sidecar = source + '.stats.json'
+	if not os.path.exists(source) and os.path.exists(sidecar):				#Only the sidecar was kept, for example next to the trained weights
+		with open(sidecar, 'r') as TheFile:
+			return(json.load(TheFile))
+	stat = os.stat(source)
+	stamp = [stat.st_size, stat.st_mtime]
+	stats = None
+	if os.path.exists(sidecar):
+		with open(sidecar, 'r') as TheFile:
+			stats = json.load(TheFile)
+		current = 'names' in stats and (names is None or stats['names'] == names)	#Older sidecars without the channel names are recomputed
+		if stats.get('stamp') == stamp and current:
+			return(stats)
+		if names is None:
+			names = stats.get('names')											#Merge rewrites the data but not its layout
+		digest = Hash(source)
+		if stats.get('hash') != digest or not current:
+			stats = None
+	else:
+		digest = Hash(source)
+	if stats is None:
+		numeric = True
+		if source.endswith('.csv'):
+			channels = Channels(source, residues)
+			with open(source, 'r') as TheFile:
+				names = Names(TheFile.readline(), channels)
+			blocks = ((block, lengths) for IDs, block, lengths in Rows(source, channels, residues, chunk))
+		else:
+			X, IDs, lengths = Load(source)
+			numeric = X.dtype != np.uint8											#Text datasets only get the row and length counts
+			X = X.reshape(len(X), X.shape[1], int(np.prod(X.shape[2:])))				#Also for empty datasets
+			blocks = ((X[start:start + chunk], lengths[start:start + chunk]) for start in range(0, len(X), chunk))
+		rows, total, low, high, sums, sizes = 0, 0, None, None, None, []
+		for block, lengths in blocks:
+			rows += len(block)
+			sizes.append(np.asarray(lengths))
+			if not numeric:
+				continue
+			values = np.asarray(block, dtype=np.float64)[np.arange(block.shape[1]) < lengths[:, None]]
+			total += len(values)
+			if len(values) > 0:
+				low = values.min(axis=0) if low is None else np.minimum(low, values.min(axis=0))
+				high = values.max(axis=0) if high is None else np.maximum(high, values.max(axis=0))
+				sums = values.sum(axis=0) if sums is None else sums + values.sum(axis=0)
+		sizes = np.concatenate(sizes).astype(np.int64) if sizes != [] else np.zeros(0, dtype=np.int64)
+		stats = {
+			'rows':rows,
+			'channels':len(high) if high is not None else 0,
+			'min':low.tolist() if low is not None else [],
+			'max':high.tolist() if high is not None else [],
+			'mean':(sums / total).tolist() if sums is not None else [],
+			'names':names,
+			'cst_max':float(high[2]) if high is not None and names == ['phi', 'psi', 'cst'] else None,
+			'length':{'min':int(sizes.min()) if len(sizes) > 0 else 0, 'max':int(sizes.max()) if len(sizes) > 0 else 0, 'mean':float(sizes.mean()) if len(sizes) > 0 else 0.0, 'counts':{str(size):int(count) for size, count in zip(*np.unique(sizes, return_counts=True))}}}
+	stats['hash'] = digest
+	stats['stamp'] = stamp
+	temp = '{}.{}.tmp'.format(sidecar, os.getpid())
+	with open(temp, 'w') as TheFile:
+		json.dump(stats, TheFile, indent=1)
+	os.replace(temp, sidecar)
+	return(stats)
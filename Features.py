@@ -0,0 +1,160 @@
+#!/usr/bin/python
+
+import os
+import numpy as np
+import Dataset
+
+# The feature name of each dataset written by Database.py
+Names = {'dataR':'R', 'dataCA':'CA', 'dataPS':'PS', 'dataPSO':'PSO', 'dataPSOC':'PSOC', 'dataPSC':'PSC', 'FASTA':'Fasta', 'SS':'SS'}
+
+# The summary columns that every store has, followed by one presence column per feature
+Columns = [('ID', 'U16'), ('length', np.int32), ('helix', np.float32), ('sheet', np.float32), ('loop', np.float32), ('rg', np.float32)]
+
+def Key(name):
+	'''
+	The normalized ID of a chain (XXXX_A) from any of the names the
+	datasets use: file names with a path or a .pdb extension, and
+	the Clean- prefix of cleaned structures
+	'''
+	name = os.path.basename(str(name))
+	if name.endswith('.pdb'):
+		name = name[:-4]
+	if name.startswith('Clean-'):
+		name = name[6:]
+	code, separator, rest = name.partition('_')
+	return(code.upper() + separator + rest)
+
+def Composition(SS, lengths):
+	''' The fraction of helix, sheet, and loop residues of each row of an SS dataset (uint8 character codes) '''
+	lengths = np.maximum(lengths, 1)
+	return([(SS == ord(code)).sum(axis=1) / lengths for code in ('H', 'S', 'L')])
+
+def Gyration(CA, lengths):
+	''' The radius of gyration of the CA atoms of each row of a CA dataset, ignoring the zero padding '''
+	mask = np.arange(CA.shape[1]) < lengths[:, None]
+	count = np.maximum(lengths, 1)[:, None]
+	center = (CA * mask[:, :, None]).sum(axis=1) / count
+	distance = ((CA - center[:, None]) ** 2).sum(axis=2) * mask
+	return(np.sqrt(distance.sum(axis=1) / count[:, 0]))
+
+def Build(datasets, directory='Features', chunk=4096):
+	'''
+	Join datasets written by Database.py into one feature store.
+	Every dataset's rows are re-keyed by the normalized chain ID and
+	copied, in chunks, into an aligned .npy file per feature, so row
+	i of every feature belongs to the same chain (rows of chains a
+	dataset does not have are zero). A summary.npy structured array
+	holds each chain's ID, length, helix/sheet/loop fractions (from
+	the SS dataset), CA radius of gyration (from the CA dataset),
+	and whether each feature is present. datasets is a list of
+	dataset names (dataPS, SS, ...) or a {feature: dataset} dict
+	'''
+	if not isinstance(datasets, dict):
+		datasets = {Names.get(os.path.basename(name), os.path.basename(name)):name for name in datasets}
+	os.makedirs(directory, exist_ok=True)
+	loaded = {}
+	for feature, name in datasets.items():
+		X, IDs, lengths = Dataset.Load(name)
+		loaded[feature] = (X, np.array([Key(ID) for ID in IDs.tolist()]), lengths)
+	IDs = np.unique(np.concatenate([keys for X, keys, lengths in loaded.values()])) if loaded != {} else np.zeros(0, dtype=str)
+	summary = np.zeros(len(IDs), dtype=[('ID', IDs.dtype if len(IDs) > 0 else 'U16')] + Columns[1:] + [(feature, bool) for feature in loaded])
+	summary['ID'] = IDs
+	for column in ('helix', 'sheet', 'loop', 'rg'):
+		summary[column] = np.nan
+	for feature, (X, keys, lengths) in loaded.items():
+		rows = np.searchsorted(IDs, keys)
+		aligned = np.lib.format.open_memmap(os.path.join(directory, feature + '.tmp.npy'), mode='w+', dtype=X.dtype, shape=(len(IDs),) + X.shape[1:])
+		for start in range(0, len(rows), chunk):
+			block = slice(start, start + chunk)
+			aligned[rows[block]] = X[block]
+			if feature == 'SS':
+				summary['helix'][rows[block]], summary['sheet'][rows[block]], summary['loop'][rows[block]] = Composition(X[block], lengths[block])
+			elif feature == 'CA':
+				summary['rg'][rows[block]] = Gyration(np.asarray(X[block], dtype=np.float64), lengths[block])
+		aligned.flush()
+		del aligned
+		os.replace(os.path.join(directory, feature + '.tmp.npy'), os.path.join(directory, feature + '.npy'))
+		summary['length'][rows] = np.maximum(summary['length'][rows], lengths)
+		summary[feature][rows] = True
+	np.save(os.path.join(directory, 'summary.npy'), summary)
+	print('\x1b[32m' + 'Feature store of {} chains with the {} features'.format(len(IDs), ', '.join(loaded)) + '\x1b[0m')
+	return(Store(directory))
+
+class Store():
+	'''
+	A feature store built by Build(). The features are memory-mapped
+	so opening the store reads only the summary, a chain is found by
+	its ID through a dictionary, and subsets are selected with
+	vectorized conditions on the summary columns
+	'''
+	def __init__(self, directory='Features'):
+		self.directory = directory
+		self.summary = np.load(os.path.join(directory, 'summary.npy'))
+		self.index = {ID:row for row, ID in enumerate(self.summary['ID'].tolist())}
+		self.features = {}
+		for feature in self.summary.dtype.names[len(Columns):]:
+			self.features[feature] = np.load(os.path.join(directory, feature + '.npy'), mmap_mode='r')
+
+	def __len__(self):
+		return(len(self.summary))
+
+	def __contains__(self, ID):
+		return(Key(ID) in self.index)
+
+	def Row(self, ID):
+		''' The row of a chain, raises KeyError for chains that are not in the store '''
+		return(self.index[Key(ID)])
+
+	def Get(self, ID, feature=None):
+		''' One chain's values of a feature, or a {feature: values} dictionary of every feature it has '''
+		row = self.Row(ID)
+		if feature is not None:
+			return(self.features[feature][row])
+		return({name:values[row] for name, values in self.features.items() if self.summary[name][row]})
+
+	def Select(self, require=(), **ranges):
+		'''
+		The rows (sorted) of the chains that have every required
+		feature and whose summary columns fall within the given
+		(low, high) ranges, a None bound is open. For example
+		Select(('PS',), helix=(0.5, None), length=(80, 150))
+		'''
+		mask = np.ones(len(self.summary), dtype=bool)
+		for feature in require:
+			mask &= self.summary[feature]
+		for column, (low, high) in ranges.items():
+			values = self.summary[column]
+			if low is not None:
+				mask &= values >= low
+			if high is not None:
+				mask &= values <= high
+		return(np.flatnonzero(mask))
+
+	def IDs(self, rows=None):
+		''' The IDs of some rows, or of every row '''
+		return(self.summary['ID'] if rows is None else self.summary['ID'][rows])
+
+	def Export(self, rows, feature, filename=None, chunk=4096):
+		'''
+		The selected rows of a feature as one (rows, residues,
+		channels) array. Without a filename a contiguous selection is
+		returned as a view of the memory map without copying anything
+		and any other selection is gathered in memory. With a filename
+		the rows are gathered in chunks into a new dataset (.npy and
+		.index.npz, as written by Dataset.Writer) that is returned
+		memory-mapped
+		'''
+		values = self.features[feature]
+		rows = np.asarray(rows, dtype=np.int64)
+		if filename is None:
+			if len(rows) > 0 and np.all(np.diff(rows) == 1):
+				return(values[rows[0]:rows[-1] + 1])
+			return(values[rows])
+		if filename.endswith('.npy'):
+			filename = filename[:-4]
+		out = np.lib.format.open_memmap(filename + '.npy', mode='w+', dtype=values.dtype, shape=(len(rows),) + values.shape[1:])
+		for start in range(0, len(rows), chunk):
+			out[start:start + chunk] = values[rows[start:start + chunk]]
+		out.flush()
+		np.savez(filename + '.index.npz', PDB_ID=self.summary['ID'][rows], Length=self.summary['length'][rows])
+		return(out)
@@ -1,18 +1,27 @@
 #!/usr/bin/python
 
+import io
 import os
 import re
 import bs4
 import sys
+import json
+import uuid
 import time
+import queue
 import keras
 import Bio.PDB
 import datetime
 import requests
 import argparse
+import threading
+import http.server
 import numpy as np
-import pandas as pd
+import socketserver
 import urllib.request
+import Cache
+import Dataset
+import Geometry
 from Bio import pairwise2
 from pyrosetta import *
 from pyrosetta.toolbox import *
@@ -20,6 +29,14 @@ init()
 
 parser = argparse.ArgumentParser(description='De Novo Protein Design Neural Network')
 parser.add_argument('-t', '--train', action='store_true', help='Train the neural network')
+parser.add_argument('-e', '--epochs', type=int, default=3, help='Number of training epochs (passes over the whole dataset)')
+parser.add_argument('--steps', type=int, default=None, help='Stop training after this many steps in total')
+parser.add_argument('-n', '--samples', type=int, default=1, help='Generate this many backbones into samples.npy instead of folding one')
+parser.add_argument('-s', '--seed', type=int, default=None, help='Random seed of the generated samples')
+parser.add_argument('--clashes', type=int, default=0, help='Pre-fold screen: most CA clashes (closer than 3 Å) a sample may have')
+parser.add_argument('--compact', type=float, default=3.0, help='Pre-fold screen: largest CA Rg as a multiple of length^0.38 Å')
+parser.add_argument('--agreement', type=float, default=10.0, help='Pre-fold screen: largest RMS difference (Å) between the backbone and its constraints')
+parser.add_argument('--serve', metavar='ADDRESS', help='Keep the generator and PyRosetta loaded and serve generate/fold requests on a Unix socket path or a host:port')
 args = parser.parse_args()
 
 class RosettaDesign():
@@ -201,7 +218,7 @@ class RosettaDesign():
 			thefile.close()
 			atom += 1
 		#B - Generate blueprint file (remodeling only large loops)
-		dssp = Bio.PDB.DSSP(structure[0], filename)
+		dssp = Cache.DSSP(filename, acc_array='Sander')
 		SS = []
 		SEQ = []
 		for ss in dssp:
@@ -291,9 +308,7 @@ class RosettaDesign():
 		Mutate = [1]
 		while Mutate != []:
 			inputfile = 'temp.pdb'
-			parser = Bio.PDB.PDBParser()
-			structure = parser.get_structure('{}'.format(inputfile), inputfile)
-			dssp = Bio.PDB.DSSP(structure[0], inputfile, acc_array='Wilke')
+			dssp = Cache.DSSP(inputfile)
 			sasalist = []
 			for x in dssp:
 				if x[1] == 'A':
@@ -620,9 +635,7 @@ class MCRosettaDesign():
 		2. Fixed backbone design (by SASA layers)
 		'''
 		# Generate resfile
-		parser = Bio.PDB.PDBParser()
-		structure = parser.get_structure('{}'.format(filename), filename)
-		dssp = Bio.PDB.DSSP(structure[0], filename, acc_array='Wilke')
+		dssp = Cache.DSSP(filename)
 		sasalist = []
 		for x in dssp:
 			if x[1] == 'A':
@@ -863,8 +876,7 @@ class MCRosettaDesign():
 		5. Relax
 		'''
 		# Generate blueprint file
-		structure = Bio.PDB.PDBParser(QUIET=True).get_structure('{}'.format(filename), filename)
-		dssp = Bio.PDB.DSSP(structure[0], filename)
+		dssp = Cache.DSSP(filename, acc_array='Sander')
 		SS = []
 		SEQ = []
 		for ss in dssp:
@@ -905,9 +917,7 @@ class MCRosettaDesign():
 			blueprint.write(line+'\n')
 		blueprint.close()
 		# Generate resfile
-		parser = Bio.PDB.PDBParser()
-		structure = parser.get_structure('{}'.format(filename), filename)
-		dssp = Bio.PDB.DSSP(structure[0], filename, acc_array='Wilke')
+		dssp = Cache.DSSP(filename)
 		sasalist = []
 		for x in dssp:
 			if x[1] == 'A':
@@ -1316,22 +1326,10 @@ def Fragments(filename):
 def CSTMax(filename):
 	'''
 	find the minimum and maximum range of the constraints
-	values of a dataset
+	values of a dataset, read from the dataset's statistics
+	sidecar which is only computed when the dataset changes
 	'''
-	maxline = []
-	data = open(filename, 'r')
-	next(data)
-	for line in data:
-		line = line.strip().split(';')
-		cst = []
-		count = 1
-		for item in line:
-			if count < 450:
-				count += 3
-				cst.append(float(line[count]))
-		maxline.append(max(cst))
-	maximum = max(maxline)
-	return(maximum)
+	return(Dataset.Statistics(filename)['cst_max'])
 
 def FoldPDB_PS(data):
 	'''
@@ -1421,30 +1419,16 @@ def FoldPDB_PSC(data):
 	pose.dump_pdb('Backbone.pdb')
 	os.remove('constraints.cst')
 
-def DCGAN_PS(choice, filename):
+# Generators already built with their weights loaded, by (channels, weights file)
+Generators = {}
+
+def Networks(channels, latent=100):
 	'''
-	A Convolutional Generative Adverserial Neural Network that will learn the structure of
-	ideal proteins given their phi, psi angles (the dataPS.csv dataset).
-	Then it generates novel angles and from random noise that will fold
-	into a novel protein backbone.
+	Build the DCGAN for a dataset with the given number of channels
+	per residue (2 for PS, 3 for PSC). Returns the discriminator, the
+	generator, and the compiled discriminator and adversarial models
 	'''
-	# Import data
-	data = pd.read_csv(filename, ';')
-	# Convert data into numpy arrays
-	phi = data[data.columns[2::2]].values
-	psi = data[data.columns[3::2]].values
-	# MinMax scaling
-	phi /= 360
-	psi /= 360
-	# Make the tensor - shape (examples, residues, 2 channels 3 P S )
-	X = np.array([phi, psi])	# Shape = (2, 82900, 150)
-	X = np.swapaxes(X, 0, 2)	# Change shape to (150, 82900, 2)
-	X = np.swapaxes(X, 0, 1)	# Change shape to (82900, 150, 2)
-	#Network values
-	shape = (150, 2)
-	latent = 100
-	batchs = 32
-	epochs = 3
+	shape = (150, channels)
 	#Discriminator
 	D = keras.models.Sequential()
 	D.add(keras.layers.Conv1D(32, kernel_size=3, input_shape=shape))
@@ -1457,19 +1441,8 @@ def DCGAN_PS(choice, filename):
 	D.add(keras.layers.LeakyReLU(alpha=0.2))
 	D.add(keras.layers.Flatten())
 	D.add(keras.layers.Dense(1, activation='sigmoid'))
-	D.summary()
 	#Generator
-	G = keras.models.Sequential()
-	G.add(keras.layers.Dense(79*3, activation='relu', input_dim=latent))
-	G.add(keras.layers.Reshape((79, 3)))
-	G.add(keras.layers.Conv1D(128, kernel_size=3))
-	G.add(keras.layers.Activation('relu'))
-	G.add(keras.layers.UpSampling1D())
-	G.add(keras.layers.Conv1D(64, kernel_size=3))
-	G.add(keras.layers.Activation('relu'))
-	G.add(keras.layers.Conv1D(2, kernel_size=3))
-	G.add(keras.layers.Activation('tanh'))
-	G.summary()
+	G = Generator(channels, latent)
 	#Discriminator Model
 	DM = keras.models.Sequential()
 	DM.add(D)
@@ -1479,75 +1452,13 @@ def DCGAN_PS(choice, filename):
 	AM.add(G)
 	AM.add(D)
 	AM.compile(optimizer=keras.optimizers.Adam(0.001), loss='binary_crossentropy', metrics=['accuracy'])
-	if choice == 'train':
-		#Training
-		for epoch in range(epochs):
-			#Generate a fake structures
-			real = X[np.random.randint(0, X.shape[0], size=batchs)]
-			noise = np.random.uniform(0.0, 1.0, size=[batchs, 100])
-			fake = G.predict(noise)
-			#Train discriminator
-			x = np.concatenate((real, fake))
-			y = np.ones([2*batchs, 1])
-			y[batchs:, :] = 0
-			d_loss = DM.train_on_batch(x, y)
-			#Train adversarial
-			y = np.ones([batchs, 1])
-			a_loss = AM.train_on_batch(noise, y)
-			D_loss = round(float(d_loss[0]), 3)
-			D_accu = round(float(d_loss[1]), 3)
-			A_loss = round(float(a_loss[0]), 3)
-			print('{:7} [D loss: {:.3f}, accuracy: {:.3f}] [G loss: {:.3f}]'.format(epoch, D_loss, D_accu, A_loss))
-			#Save Model
-			G.save_weights('weights.h5')
-	elif choice == 'generate':
-		#Generate
-		G.load_weights('weights.h5')
-		noise = np.random.normal(0.5, 0.5, (1, 100))
-		gen = G.predict(noise)
-		gen = gen.reshape([300])
-		gen = np.ndarray.tolist(gen)
-		phiout = gen[0::2]		#[start:end:step]
-		psiout = gen[1::2]		#[start:end:step]
-		#Re-normalise
-		phiout = [x*360.0 for x in phiout]
-		psiout = [x*360.0 for x in psiout]
-		return(phiout, psiout)
+	return(D, G, DM, AM)
 
-def DCGAN_PSC(choice, filename, CSTmax):
-	# Import data
-	data = pd.read_csv(filename, ';')
-	# Convert data into numpy arrays
-	phi = data[data.columns[2::3]].values
-	psi = data[data.columns[3::3]].values
-	cst = data[data.columns[4::3]].values
-	# MinMax scaling
-	phi /= 360
-	psi /= 360
-	cst /= float(CSTmax)
-	# Make the tensor - shape (examples, residues, 3 channels 3 P S C)
-	X = np.array([phi, psi, cst])	# Shape = (3, 82900, 150)
-	X = np.swapaxes(X, 0, 2)		# Change shape to (150, 82900, 3)
-	X = np.swapaxes(X, 0, 1)		# Change shape to (82900, 150, 3)
-	#Network values
-	shape = (150, 3)
-	latent = 100
-	batchs = 32
-	epochs = 3
-	#Discriminator
-	D = keras.models.Sequential()
-	D.add(keras.layers.Conv1D(32, kernel_size=3, input_shape=shape))
-	D.add(keras.layers.LeakyReLU(alpha=0.2))
-	D.add(keras.layers.Conv1D(64, kernel_size=3))
-	D.add(keras.layers.LeakyReLU(alpha=0.2))
-	D.add(keras.layers.Conv1D(128, kernel_size=3))
-	D.add(keras.layers.LeakyReLU(alpha=0.2))
-	D.add(keras.layers.Conv1D(256, kernel_size=3))
-	D.add(keras.layers.LeakyReLU(alpha=0.2))
-	D.add(keras.layers.Flatten())
-	D.add(keras.layers.Dense(1, activation='sigmoid'))
-	D.summary()
-	#Generator
+def Generator(channels, latent=100):
+	'''
+	Build the generator network, it turns a latent noise vector
+	into (150, channels) MinMax scaled values
+	'''
 	G = keras.models.Sequential()
 	G.add(keras.layers.Dense(79*3, activation='relu', input_dim=latent))
 	G.add(keras.layers.Reshape((79, 3)))
@@ -1556,61 +1467,464 @@ def DCGAN_PSC(choice, filename, CSTmax):
 	G.add(keras.layers.UpSampling1D())
 	G.add(keras.layers.Conv1D(64, kernel_size=3))
 	G.add(keras.layers.Activation('relu'))
-	G.add(keras.layers.Conv1D(3, kernel_size=3))
+	G.add(keras.layers.Conv1D(channels, kernel_size=3))
 	G.add(keras.layers.Activation('tanh'))
-	G.summary()
-	#Discriminator Model
-	DM = keras.models.Sequential()
-	DM.add(D)
-	DM.compile(optimizer=keras.optimizers.Adam(0.001), loss='binary_crossentropy', metrics=['accuracy'])
-	#Adversarial Model
-	AM = keras.models.Sequential()
-	AM.add(G)
-	AM.add(D)
-	AM.compile(optimizer=keras.optimizers.Adam(0.001), loss='binary_crossentropy', metrics=['accuracy'])
+	return(G)
+
+def Trained(channels, weights='weights.h5'):
+	'''
+	The generator with its trained weights, built and loaded only
+	once per process and reused by every later call
+	'''
+	key = (channels, os.path.abspath(weights))
+	if key not in Generators:
+		G = Generator(channels)
+		G.load_weights(weights)
+		Generators[key] = G
+	return(Generators[key])
+
+def Noise(rng, n, latent=100):
+	''' The generator's input, n latent noise vectors '''
+	return(rng.normal(0.5, 0.5, (n, latent)))
+
+def Stream(G, n, scale, seed=None, batch=1024, latent=100):
+	'''
+	Generate n samples in batches, yields (batch, 150, channels)
+	float32 arrays already re-scaled (degrees for the angles, Å for
+	the constraints). The same seed always gives the same samples,
+	so very large runs can be streamed to disk without holding all
+	the samples in memory
+	'''
+	rng = np.random.default_rng(seed)
+	scale = np.asarray(scale, dtype=np.float32)
+	for start in range(0, n, batch):
+		noise = Noise(rng, min(batch, n - start), latent)
+		yield(np.asarray(G.predict_on_batch(noise), dtype=np.float32) * scale)
+
+def Sample(G, n, scale, seed=None, batch=1024):
+	'''
+	Generate n samples in vectorized batches, returns one
+	(n, 150, channels) float32 array already re-scaled
+	'''
+	samples = np.empty((n,) + tuple(G.output_shape[1:]), dtype=np.float32)
+	start = 0
+	for block in Stream(G, n, scale, seed, batch):
+		samples[start:start + len(block)] = block
+		start += len(block)
+	return(samples)
+
+def Candidate(G, scale, seed=None, batch=64, tries=100, screen=None):
+	'''
+	Generate samples in batches until one passes Geometry.Screen()
+	(screen holds its thresholds), so only samples whose backbone is
+	not clashing, compact, and agrees with its constraints are given
+	to PyRosetta to fold. When none of them passes the best one (the
+	fewest failed checks, then the fewest clashes) is returned with a
+	warning
+	'''
+	best, rank = None, None
+	for block in Stream(G, batch * tries, scale, seed, batch):
+		result = Geometry.Screen(block, **(screen or {}))
+		order = np.lexsort((result['agreement'], result['clashes'], result['failed']))
+		if result['passed'][order[0]]:
+			return(block[order[0]])
+		if rank is None or (result['failed'][order[0]], result['clashes'][order[0]]) < rank:
+			best, rank = block[order[0]], (result['failed'][order[0]], result['clashes'][order[0]])
+	print('\x1b[33m' + 'None of the {} generated samples passed the pre-fold screen, folding the best one ({} failed checks)'.format(batch * tries, rank[0]) + '\x1b[0m')
+	return(best)
+
+def DCGAN_PS(choice, filename, epochs=3, steps=None, screen=None):
+	'''
+	A Convolutional Generative Adverserial Neural Network that will learn the structure of
+	ideal proteins given their phi, psi angles (the dataPS.csv dataset).
+	Then it generates novel angles and from random noise that will fold
+	into a novel protein backbone.
+	'''
+	#Network values
+	latent = 100
+	batchs = 32
 	if choice == 'train':
-		#Training
-		for epoch in range(epochs):
-			#Generate a fake structures
-			real = X[np.random.randint(0, X.shape[0], size=batchs)]
-			noise = np.random.uniform(0.0, 1.0, size=[batchs, 100])
-			fake = G.predict(noise)
-			#Train discriminator
-			x = np.concatenate((real, fake))
-			y = np.ones([2*batchs, 1])
-			y[batchs:, :] = 0
-			d_loss = DM.train_on_batch(x, y)
-			#Train adversarial
-			y = np.ones([batchs, 1])
-			a_loss = AM.train_on_batch(noise, y)
-			D_loss = round(float(d_loss[0]), 3)
-			D_accu = round(float(d_loss[1]), 3)
-			A_loss = round(float(a_loss[0]), 3)
-			print('{:7} [D loss: {:.3f}, accuracy: {:.3f}] [G loss: {:.3f}]'.format(epoch, D_loss, D_accu, A_loss))
-			#Save Model
-			G.save_weights('weights.h5')
+		Train(filename, [360, 360], epochs, batchs, latent, steps=steps)
+	elif choice == 'generate':
+		#Generate
+		gen = Candidate(Trained(2), [360.0, 360.0], screen=screen)
+		phiout = gen[:, 0].tolist()
+		psiout = gen[:, 1].tolist()
+		return(phiout, psiout)
+
+def DCGAN_PSC(choice, filename, CSTmax, epochs=3, steps=None, screen=None):
+	#Network values
+	latent = 100
+	batchs = 32
+	if choice == 'train':
+		Train(filename, [360, 360, float(CSTmax)], epochs, batchs, latent, steps=steps)
 	elif choice == 'generate':
 		#Generate
-		G.load_weights('weights.h5')
-		noise = np.random.normal(0.5, 0.5, (1, 100))
-		gen = G.predict(noise)
-		gen = gen.reshape([450])
-		gen = np.ndarray.tolist(gen)
-		phiout = gen[0::3]	#[start:end:step]
-		psiout = gen[1::3]	#[start:end:step]
-		cstout = gen[2::3]	#[start:end:step]
-		#Re-normalise
-		phiout = [x*360.0 for x in phiout]
-		psiout = [x*360.0 for x in psiout]
-		cstout = [x*float(CSTmax) for x in cstout]
+		gen = Candidate(Trained(3), [360.0, 360.0, float(CSTmax)], screen=screen)
+		phiout = gen[:, 0].tolist()
+		psiout = gen[:, 1].tolist()
+		cstout = gen[:, 2].tolist()
 		return(phiout, psiout, cstout)
 
+class Service():
+	'''
+	Keeps the trained generator loaded and answers generate and fold
+	requests from many clients. A generator thread collects the
+	requests that arrive within a short wait into one micro-batch and
+	runs the generator once for the whole batch. The samples of fold
+	requests are handed to a separate fold thread that folds the ones
+	that pass Geometry.Screen() one at a time (PyRosetta is only ever
+	used from this thread), so generate requests never wait behind a
+	FastRelax
+	'''
+	def __init__(self, channels, scale, weights='weights.h5', batch=1024, wait=0.01, output='Folds', limit=100000, screen=None):
+		self.channels = channels
+		self.screen = screen or {}
+		self.scale = np.asarray(scale, dtype=np.float32)
+		self.G = Trained(channels, weights)
+		self.batch = batch
+		self.wait = wait
+		self.limit = limit
+		self.output = os.path.abspath(output)
+		self.queue = queue.Queue()
+		self.folds = queue.Queue()
+		os.makedirs(self.output, exist_ok=True)
+		threading.Thread(target=self.Work, daemon=True).start()
+		threading.Thread(target=self.FoldWork, daemon=True).start()
+
+	def Submit(self, kind, n=1, seed=None):
+		'''
+		Queue a request and wait for its result, the samples array
+		of a generate request or the PDB paths of a fold request.
+		Raises ValueError for a request that is not valid (n must be
+		between 1 and the limit, the seed a non-negative integer) before
+		it is queued, so it can never fail the requests batched with it
+		'''
+		if kind not in ('generate', 'fold'):
+			raise ValueError('Unknown request {}'.format(kind))
+		if isinstance(n, bool) or not isinstance(n, int) or not 1 <= n <= self.limit:
+			raise ValueError('n must be an integer from 1 to {}'.format(self.limit))
+		if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+			raise ValueError('seed must be a non-negative integer')
+		request = {'kind':kind, 'n':n, 'seed':seed, 'done':threading.Event(), 'result':None, 'error':None}
+		self.queue.put(request)
+		request['done'].wait()
+		if request['error'] is not None:
+			raise RuntimeError(request['error'])
+		return(request['result'])
+
+	def Work(self):
+		''' The generator thread, serves the queued requests in micro-batches '''
+		while True:
+			requests = [self.queue.get()]
+			total = requests[0]['n']
+			deadline = time.monotonic() + self.wait
+			while total < self.batch:
+				try:
+					request = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+				except queue.Empty:
+					break
+				requests.append(request)
+				total += request['n']
+			try:
+				noise = np.concatenate([Noise(np.random.default_rng(request['seed']), request['n']) for request in requests])
+				samples = np.concatenate([np.asarray(self.G.predict_on_batch(noise[start:start + self.batch]), dtype=np.float32) for start in range(0, len(noise), self.batch)]) * self.scale
+			except Exception as TheError:
+				for request in requests:
+					request['error'] = str(TheError)
+					request['done'].set()
+				continue
+			start = 0
+			for request in requests:
+				request['result'] = samples[start:start + request['n']]
+				start += request['n']
+				if request['kind'] == 'fold':
+					self.folds.put(request)
+				else:
+					request['done'].set()
+
+	def FoldWork(self):
+		''' The fold thread, folds the samples of fold requests one request at a time '''
+		while True:
+			request = self.folds.get()
+			try:
+				samples = request['result']
+				request['result'] = [self.Fold(sample) if passed else None for sample, passed in zip(samples, Geometry.Screen(samples, **self.screen)['passed'])]
+			except Exception as TheError:
+				request['error'] = str(TheError)
+			request['done'].set()
+
+	def Fold(self, sample):
+		''' Fold one sample, returns the path of its backbone structure '''
+		if self.channels == 3:
+			FoldPDB_PSC(sample.T.tolist())
+		else:
+			FoldPDB_PS(sample.T.tolist())
+		filename = os.path.join(self.output, 'Backbone_{}.pdb'.format(uuid.uuid4().hex))
+		os.replace('Backbone.pdb', filename)
+		return(filename)
+
+class Handler(http.server.BaseHTTPRequestHandler):
+	'''
+	POST /generate or /fold with a JSON body {"n": samples, "seed":
+	seed}. A generate request gets the (n, 150, channels) samples as
+	a .npy file, a fold request gets {"paths": [PDB paths]} as JSON
+	(null for the samples that failed the pre-fold screen). Requests
+	that are not valid get a 400 error
+	'''
+	service = None
+
+	def do_POST(self):
+		kind = self.path.strip('/')
+		if kind not in ('generate', 'fold'):
+			self.send_error(404, 'Unknown request {}'.format(self.path))
+			return
+		try:
+			request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+			if not isinstance(request, dict):
+				raise ValueError('The request must be a JSON object')
+			result = self.service.Submit(kind, request.get('n', 1), request.get('seed'))
+		except ValueError as TheError:								#Also bad JSON, rejected before anything is queued
+			self.send_error(400, str(TheError))
+			return
+		except Exception as TheError:
+			self.send_error(500, str(TheError))
+			return
+		if kind == 'generate':
+			body = io.BytesIO()
+			np.save(body, result)
+			body = body.getvalue()
+			content = 'application/octet-stream'
+		else:
+			body = json.dumps({'paths':result}).encode()
+			content = 'application/json'
+		self.send_response(200)
+		self.send_header('Content-Type', content)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def address_string(self):
+		return(str(self.client_address) if self.client_address else 'unix')
+
+	def log_message(self, format, *arguments):
+		pass
+
+class HTTPServer(http.server.ThreadingHTTPServer):
+	''' A localhost HTTP server, one thread per connection '''
+	request_queue_size = 128
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	''' An HTTP server on a Unix socket, one thread per connection '''
+	daemon_threads = True
+	request_queue_size = 128
+
+def Serve(address, channels, scale, weights='weights.h5', screen=None):
+	'''
+	Run the generate/fold service until it is killed. An address
+	with a colon is a localhost HTTP host:port, anything else is the
+	path of a Unix socket. Use Client.py to send requests
+	'''
+	service = Service(channels, scale, weights, screen=screen)
+	handler = type('ServiceHandler', (Handler,), {'service':service})
+	if ':' in address:
+		host, port = address.rsplit(':', 1)
+		server = HTTPServer((host, int(port)), handler)
+	else:
+		if os.path.exists(address):
+			os.remove(address)
+		server = UnixServer(address, handler)
+	print('\x1b[32m' + 'Serving on {}'.format(address) + '\x1b[0m')
+	try:
+		server.serve_forever()
+	finally:
+		server.server_close()
+		if ':' not in address and os.path.exists(address):
+			os.remove(address)
+
+def Variables(model):
+	''' The variables of a compiled model's optimizer, created now if no training step made them yet '''
+	optimizer = model.optimizer
+	variables = optimizer.variables() if callable(optimizer.variables) else optimizer.variables
+	if not getattr(optimizer, 'built', len(variables) > 1):
+		if hasattr(optimizer, 'build'):
+			optimizer.build(model.trainable_variables)
+		else:
+			optimizer._create_all_weights(model.trainable_variables)
+		variables = optimizer.variables() if callable(optimizer.variables) else optimizer.variables
+	return(variables)
+
+def Snapshot(state, D, G, DM, AM):
+	'''
+	Copy everything needed to resume training into NumPy arrays: the
+	weights of both networks, the state of both optimizers, and the
+	training position as JSON
+	'''
+	arrays = {'state':np.array(json.dumps(state))}
+	for name, values in (('D', D.get_weights()), ('G', G.get_weights()), ('DM', [np.array(variable) for variable in Variables(DM)]), ('AM', [np.array(variable) for variable in Variables(AM)])):
+		for i, value in enumerate(values):
+			arrays['{}_{}'.format(name, i)] = value
+	return(arrays)
+
+def Restore(filename, D, G, DM, AM):
+	''' Load a checkpoint written by Checkpointer into the networks and optimizers, returns the training position '''
+	checkpoint = np.load(filename)
+	def values(name):
+		return([checkpoint[key] for key in sorted((key for key in checkpoint.files if key.startswith(name + '_')), key=lambda key: int(key.rsplit('_', 1)[1]))])
+	D.set_weights(values('D'))
+	G.set_weights(values('G'))
+	for name, model in (('DM', DM), ('AM', AM)):
+		for variable, value in zip(Variables(model), values(name)):
+			variable.assign(value)
+	return(json.loads(str(checkpoint['state'])))
+
+class Checkpointer():
+	'''
+	Writes checkpoints in a background thread so training does not
+	wait for the disk. The training thread only copies the weights
+	into memory, the file is written to a temporary name and renamed
+	so an interrupted write never replaces the last good checkpoint
+	'''
+	def __init__(self, filename):
+		self.filename = filename
+		self.queue = queue.Queue(maxsize=1)
+		self.thread = threading.Thread(target=self.Write, daemon=True)
+		self.thread.start()
+
+	def Save(self, arrays):
+		''' Queue a snapshot, waits only if the previous one is still being written '''
+		self.queue.put(arrays)
+
+	def Write(self):
+		while True:
+			arrays = self.queue.get()
+			if arrays is None:
+				break
+			temp = '{}.{}.tmp.npz'.format(self.filename[:-4], os.getpid())
+			np.savez(temp, **arrays)
+			os.replace(temp, self.filename)
+
+	def Close(self):
+		''' Wait for the last checkpoint to be written '''
+		self.queue.put(None)
+		self.thread.join()
+
+def Prefetch(X, batch, seed, epoch, step, epochs, latent=100, prefetch=4):
+	'''
+	Draw the training batches in a background thread, yields (epoch,
+	step, real, noise) starting at a training position. Every epoch
+	is one pass over a seeded shuffle of the whole dataset and the
+	noise of each step is seeded by its position, so a resumed run
+	sees exactly the batches it would have seen
+	'''
+	steps = len(X) // batch
+	batches = queue.Queue(maxsize=prefetch)
+	stop = threading.Event()
+	def put(item):
+		while not stop.is_set():
+			try:
+				batches.put(item, timeout=0.1)
+				return(True)
+			except queue.Full:
+				pass
+		return(False)
+	def produce():
+		for e in range(epoch, epochs):
+			order = np.random.default_rng([seed, e]).permutation(len(X))
+			for s in range(step if e == epoch else 0, steps):
+				real = np.asarray(X[np.sort(order[s * batch:(s + 1) * batch])])
+				noise = np.random.default_rng([seed, e, s]).uniform(0.0, 1.0, size=[batch, latent])
+				if not put((e, s, real, noise)):
+					return
+		put(None)
+	thread = threading.Thread(target=produce, daemon=True)
+	thread.start()
+	try:
+		while True:
+			item = batches.get()
+			if item is None:
+				break
+			yield(item)
+	finally:
+		stop.set()
+
+def Train(filename, scale, epochs=3, batch=32, latent=100, steps=None, seed=0, every=500, checkpoint='checkpoint.npz', metrics='metrics.csv', weights='weights.h5'):
+	'''
+	Train the DCGAN for a number of epochs (full passes over the
+	dataset), or until a total number of steps when steps is given.
+	A checkpoint of both networks, both optimizers, and the training
+	position is written in the background every few steps and at the
+	end, and an existing checkpoint is resumed exactly. The step
+	time, samples per second, and losses of every step are appended
+	to the metrics CSV file, and the generator's weights are saved
+	to weights.h5 at the end
+	'''
+	X = Dataset.Training(filename, scale)
+	D, G, DM, AM = Networks(len(scale), latent)
+	D.summary()
+	G.summary()
+	state = {'epoch':0, 'step':0, 'total':0, 'seed':seed, 'batch':batch}
+	if os.path.exists(checkpoint):
+		state = Restore(checkpoint, D, G, DM, AM)
+		seed, batch = state['seed'], state['batch']
+		print('\x1b[32m' + 'Resuming at epoch {}, step {}'.format(state['epoch'], state['step']) + '\x1b[0m')
+	per = len(X) // batch
+	if per == 0:
+		raise ValueError('The dataset has fewer examples than one batch')
+	writer = Checkpointer(checkpoint)
+	new = not os.path.exists(metrics)
+	log = open(metrics, 'a')
+	if new:
+		log.write('step,epoch,step_time,samples_per_sec,d_loss,d_accuracy,g_loss\n')
+	y = np.ones([2*batch, 1])
+	y[batch:, :] = 0
+	ones = np.ones([batch, 1])
+	try:
+		for epoch, step, real, noise in Prefetch(X, batch, seed, state['epoch'], state['step'], epochs, latent):
+			if steps is not None and state['total'] >= steps:
+				break
+			start = time.perf_counter()
+			#Train discriminator
+			fake = G.predict_on_batch(noise)
+			d_loss = DM.train_on_batch(np.concatenate((real, fake)), y)
+			#Train adversarial
+			a_loss = AM.train_on_batch(noise, ones)
+			took = time.perf_counter() - start
+			state['total'] += 1
+			state['epoch'], state['step'] = (epoch, step + 1) if step + 1 < per else (epoch + 1, 0)
+			D_loss, D_accu, A_loss = float(d_loss[0]), float(d_loss[1]), float(a_loss[0])
+			log.write('{},{},{:.5f},{:.1f},{:.5f},{:.5f},{:.5f}\n'.format(state['total'], epoch, took, 2*batch / took, D_loss, D_accu, A_loss))
+			print('{:7} [D loss: {:.3f}, accuracy: {:.3f}] [G loss: {:.3f}]'.format(state['total'], D_loss, D_accu, A_loss))
+			if state['total'] % every == 0:
+				log.flush()
+				writer.Save(Snapshot(state, D, G, DM, AM))
+		writer.Save(Snapshot(state, D, G, DM, AM))
+	finally:
+		writer.Close()
+		log.close()
+	#Save Model
+	G.save_weights(weights)
+
 def main():
 	cst = CSTMax('dataset.csv')
+	screen = {'clashes':args.clashes, 'compact':args.compact, 'agreement':args.agreement}
 	if args.train:
-		data = DCGAN_PSC('train', 'dataset.csv', cst)
+		data = DCGAN_PSC('train', 'dataset.csv', cst, args.epochs, args.steps)
+	elif args.serve:
+		Serve(args.serve, 3, [360.0, 360.0, cst], screen=screen)
+	elif args.samples > 1:
+		samples = np.lib.format.open_memmap('samples.npy', mode='w+', dtype=np.float32, shape=(args.samples, 150, 3))
+		result = np.zeros(args.samples, dtype=Geometry.Screening)
+		start = 0
+		for block in Stream(Trained(3), args.samples, [360.0, 360.0, cst], args.seed):
+			samples[start:start + len(block)] = block
+			result[start:start + len(block)] = Geometry.Screen(block, **screen)
+			start += len(block)
+		samples.flush()
+		np.save('samples.screen.npy', result)
+		print('\x1b[32m' + '{} of {} samples passed the pre-fold screen'.format(result['passed'].sum(), args.samples) + '\x1b[0m')
 	else:
-		data = DCGAN_PSC('generate', 'dataset.csv', cst)
+		data = DCGAN_PSC('generate', 'dataset.csv', cst, screen=screen)
 		FoldPDB_PSC(data)
 		RD = RosettaDesign()
 		RD.flxbb('Backbone.pdb', 1.0, 10, 100, 'structure')
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+import gzip
+import numpy as np
+
+# Atomic masses used for the radius of gyration
+Masses = {'C':12.0107, 'O':15.9994, 'N':14.0067, 'S':32.0650, 'H':1.00794}
+
+# The fixed columns of a PDB ATOM/HETATM line, read straight out of the file's bytes
+Columns = np.dtype({
+	'names':['record', 'name', 'altloc', 'resname', 'chain', 'resseq', 'icode', 'x', 'y', 'z', 'element'],
+	'formats':['S6', 'S4', 'S1', 'S3', 'S1', 'S4', 'S1', 'S8', 'S8', 'S8', 'S2'],
+	'offsets':[0, 12, 16, 17, 21, 22, 26, 30, 38, 46, 76],
+	'itemsize':80})
+
+# One parsed atom
+Record = np.dtype([('record', 'U6'), ('name', 'U4'), ('altloc', 'U1'), ('resname', 'U3'), ('chain', 'U1'), ('resseq', np.int64), ('icode', 'U1'), ('xyz', np.float64, (3,)), ('element', 'U2')])
+
+# The 20 standard amino acids, the only residues that make up a peptide
+Standard = np.array(['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE', 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL'])
+
+# Ideal backbone bond lengths (Å) and angles (degrees), the same values PyRosetta builds poses with
+Bonds = {'N-CA':1.458, 'CA-C':1.525, 'C-N':1.329}
+Angles = {'N-CA-C':111.2, 'CA-C-N':116.2, 'C-N-CA':121.7}
+
+# The pre-fold screen of every generated sample
+Screening = [('length', np.int32), ('clashes', np.int32), ('rg', np.float32), ('distance', np.float32), ('agreement', np.float32), ('failed', np.int8), ('passed', bool)]
+
+def Lines(data):
+	''' The ATOM and HETATM lines of the first model of a PDB file's content, as bytes '''
+	if isinstance(data, str):
+		data = data.encode()
+	end = data.find(b'\nENDMDL')
+	if end >= 0:
+		data = data[:end + 1]
+	return([line for line in data.splitlines() if line[:6] in (b'ATOM  ', b'HETATM')])
+
+def Parse(lines):
+	'''
+	Slice the fixed columns of ATOM and HETATM lines into a record
+	array with the record type, atom name, alternate location,
+	residue name, chain, residue number, insertion code, coordinates,
+	and element of every atom. All lines are converted at once by
+	NumPy, without building any per-atom Python objects
+	'''
+	raw = np.frombuffer(b''.join(line[:80].ljust(80) for line in lines), dtype=Columns)
+	atoms = np.zeros(len(raw), dtype=Record)
+	for field in ('record', 'name', 'resname'):
+		atoms[field] = np.char.strip(raw[field]).astype(str)
+	for field in ('altloc', 'chain', 'icode'):
+		atoms[field] = raw[field].astype(str)
+	atoms['resseq'] = raw['resseq'].astype(np.int64)
+	atoms['xyz'] = np.stack([raw[axis].astype(np.float64) for axis in ('x', 'y', 'z')], axis=-1)
+	element = np.char.strip(raw['element'])
+	guess = np.char.lstrip(np.char.strip(raw['name']), b'0123456789').astype('S1')	#No element column, guess from the atom name
+	atoms['element'] = np.char.upper(np.where(element == b'', guess, element).astype(str))
+	return(atoms)
+
+def Records(filename):
+	''' Read the first model of a PDB file (optionally gzipped) into a record array '''
+	with (gzip.open if filename.endswith('.gz') else open)(filename, 'rb') as TheFile:
+		return(Parse(Lines(TheFile.read())))
+
+def Atoms(filename):
+	'''
+	Read the ATOM and HETATM records of the first model of a PDB
+	file in one pass. Returns the (atoms, 3) coordinates and the
+	element, atom name, and residue number of every atom as NumPy
+	arrays, all in the same order
+	'''
+	atoms = Records(filename)
+	return(np.ascontiguousarray(atoms['xyz']), atoms['element'], atoms['name'], atoms['resseq'])
+
+def Residues(atoms):
+	''' The index of the first atom of each residue, a new residue starts wherever the chain, residue number, or insertion code changes '''
+	change = np.ones(len(atoms), dtype=bool)
+	change[1:] = (atoms['chain'][1:] != atoms['chain'][:-1]) | (atoms['resseq'][1:] != atoms['resseq'][:-1]) | (atoms['icode'][1:] != atoms['icode'][:-1])
+	return(np.flatnonzero(change))
+
+def Backbone(atoms, starts=None):
+	''' The (residues, 3, 3) N, CA, and C coordinates of each residue, NaN where an atom is missing (the first alternate location is used) '''
+	if starts is None:
+		starts = Residues(atoms)
+	index = np.zeros(len(atoms), dtype=np.int64)
+	index[starts[1:]] = 1
+	index = np.cumsum(index)
+	backbone = np.full((len(starts), 3, 3), np.nan)
+	for j, atom in enumerate(('N', 'CA', 'C')):
+		mask = np.flatnonzero((atoms['name'] == atom) & (atoms['element'] != 'CA'))	#Not calcium ions
+		residues, first = np.unique(index[mask], return_index=True)
+		backbone[residues, j] = atoms['xyz'][mask[first]]
+	return(backbone)
+
+def Amino(atoms, starts=None):
+	''' Whether each residue is one of the 20 standard amino acids '''
+	if starts is None:
+		starts = Residues(atoms)
+	return(np.isin(atoms['resname'][starts], Standard))
+
+def Peptides(atoms, radius=1.8):
+	'''
+	The (first, last) residue indices of every peptide, the same
+	chains of connected standard amino acids that Bio.PDB's
+	PPBuilder finds: two consecutive amino acids of a chain are
+	connected when the C of the first is within radius of the N of
+	the second. No peptides means a non-protein structure, more
+	than one means a broken chain
+	'''
+	starts = Residues(atoms)
+	if len(starts) < 2:
+		return(np.zeros((0, 2), dtype=np.int64))
+	backbone = Backbone(atoms, starts)
+	amino = Amino(atoms, starts)
+	chain = atoms['chain'][starts]
+	gap = np.linalg.norm(backbone[1:, 0] - backbone[:-1, 2], axis=1)				#NaN when either atom is missing, which is never connected
+	link = amino[:-1] & amino[1:] & (chain[1:] == chain[:-1]) & (gap < radius)
+	first = np.flatnonzero(link & ~np.r_[False, link[:-1]])
+	last = np.flatnonzero(link & ~np.r_[link[1:], False]) + 1
+	return(np.stack([first, last], axis=1))
+
+def Mass(element):
+	''' Map an array of element symbols to atomic masses, unknown elements get 0 '''
+	mass = np.zeros(len(element))
+	for symbol, value in Masses.items():
+		mass[element == symbol] = value
+	return(mass)
+
+def Rg(xyz, mass):
+	''' Mass weighted radius of gyration of a set of coordinates '''
+	total = mass.sum()
+	center = mass @ xyz / total
+	return(float(np.sqrt((mass * ((xyz - center) ** 2).sum(axis=1)).sum() / total)))
+
+def CA(xyz, element, name, resseq):
+	''' Coordinates of the first CA atom of each residue, in file order '''
+	mask = np.flatnonzero((name == 'CA') & (element != 'CA'))					#Not calcium ions
+	numbers, first = np.unique(resseq[mask], return_index=True)
+	return(xyz[mask[np.sort(first)]])
+
+def Distances(ca, positions):
+	''' Distances between the first CA atom and the CA atoms at the given (1-based) positions '''
+	positions = np.asarray(positions, dtype=np.int64) - 1
+	positions = positions[(positions >= 0) & (positions < len(ca))]
+	return(np.linalg.norm(ca[positions] - ca[0], axis=1))
+
+def Place(a, b, c, length, angle, torsion):
+	'''
+	The natural extension reference frame (NeRF) step: the position
+	of the atom d bonded to c with the given bond length, b-c-d angle,
+	and a-b-c-d torsion (degrees), for a whole batch of (n, 3) atoms
+	at once
+	'''
+	angle, torsion = np.radians(angle), np.radians(torsion)
+	bc = c - b
+	bc /= np.linalg.norm(bc, axis=-1, keepdims=True)
+	n = np.cross(b - a, bc)
+	n /= np.linalg.norm(n, axis=-1, keepdims=True)
+	m = np.cross(n, bc)
+	d = np.stack([-length * np.cos(angle) * np.ones_like(torsion), length * np.sin(angle) * np.cos(torsion), length * np.sin(angle) * np.sin(torsion)], axis=-1)
+	return(c + d[..., :1] * bc + d[..., 1:2] * m + d[..., 2:] * n)
+
+def Backbones(phi, psi, omega=180.0):
+	'''
+	Build the (samples, residues, 3, 3) N, CA, and C coordinates of a
+	batch of backbones from their (samples, residues) phi and psi
+	angles (degrees) with ideal bond lengths and angles. Residues
+	are placed one after the other but every sample of the batch is
+	placed at once. The phi of the first residue and the psi of the
+	last one do not move any backbone atom
+	'''
+	phi, psi = np.atleast_2d(np.asarray(phi, dtype=np.float64)), np.atleast_2d(np.asarray(psi, dtype=np.float64))
+	omega = np.broadcast_to(np.asarray(omega, dtype=np.float64), phi.shape)
+	samples, residues = phi.shape
+	xyz = np.zeros((samples, residues, 3, 3))
+	xyz[:, 0, 1] = [Bonds['N-CA'], 0.0, 0.0]
+	theta = np.radians(Angles['N-CA-C'])
+	xyz[:, 0, 2] = xyz[:, 0, 1] + Bonds['CA-C'] * np.array([-np.cos(theta), np.sin(theta), 0.0])
+	for i in range(residues - 1):
+		N, CA, C = xyz[:, i, 0], xyz[:, i, 1], xyz[:, i, 2]
+		xyz[:, i + 1, 0] = Place(N, CA, C, Bonds['C-N'], Angles['CA-C-N'], psi[:, i])
+		xyz[:, i + 1, 1] = Place(CA, C, xyz[:, i + 1, 0], Bonds['N-CA'], Angles['C-N-CA'], omega[:, i])
+		xyz[:, i + 1, 2] = Place(C, xyz[:, i + 1, 0], xyz[:, i + 1, 1], Bonds['CA-C'], Angles['N-CA-C'], phi[:, i + 1])
+	return(xyz)
+
+def Lengths(samples, tolerance=1.0):
+	''' The length of each generated (samples, residues, channels) sample, the position of its last residue whose phi or psi is not zero padding '''
+	real = (np.abs(samples[:, :, :2]) > tolerance).any(axis=2)
+	return(np.where(real.any(axis=1), samples.shape[1] - np.argmax(real[:, ::-1], axis=1), 0))
+
+def Screen(samples, clash=3.0, clashes=0, compact=3.0, distance=88.0, agreement=10.0, chunk=256):
+	'''
+	Screen generated (samples, residues, channels) phi, psi, and
+	optionally constraint values (degrees and Å) before they are
+	folded, by building their backbones with Backbones(). Within each
+	sample's length a sample fails when more than clashes pairs of CA
+	atoms at least 3 residues apart are closer than clash Å, when its
+	CA radius of gyration is above compact * length^0.38 Å (not a
+	compact structure), when a CA is more than distance Å from the
+	first CA (the same cutoff as Filter), or, with a constraint
+	channel, when the root mean square difference between the CA 1 to
+	CA i distances and the constraints is above agreement Å. Returns a
+	structured array of every sample's measurements, the number of
+	checks it failed, and its verdict
+	'''
+	samples = np.asarray(samples, dtype=np.float64)
+	result = np.zeros(len(samples), dtype=Screening)
+	for start in range(0, len(samples), chunk):
+		block = samples[start:start + chunk]
+		lengths = Lengths(block)
+		ca = Backbones(block[:, :, 0], block[:, :, 1])[:, :, 1]
+		mask = np.arange(block.shape[1]) < lengths[:, None]
+		pairs = mask[:, :, None] & mask[:, None, :] & np.triu(np.ones((block.shape[1],) * 2, dtype=bool), 3)
+		close = ((ca[:, :, None] - ca[:, None, :]) ** 2).sum(axis=-1) < clash ** 2
+		count = np.maximum(lengths, 1)
+		center = (ca * mask[:, :, None]).sum(axis=1) / count[:, None]
+		rg = np.sqrt((((ca - center[:, None]) ** 2).sum(axis=2) * mask).sum(axis=1) / count)
+		first = np.linalg.norm(ca - ca[:, :1], axis=2)
+		rows = result[start:start + chunk]
+		rows['length'] = lengths
+		rows['clashes'] = (close & pairs).sum(axis=(1, 2))
+		rows['rg'] = rg
+		rows['distance'] = (first * mask).max(axis=1)
+		if block.shape[2] > 2:
+			rows['agreement'] = np.sqrt((((first - block[:, :, 2]) ** 2) * mask).sum(axis=1) / count)
+		rows['failed'] = (lengths == 0).astype(np.int8) + (rows['clashes'] > clashes) + (rg > compact * count ** 0.38) + (rows['distance'] > distance) + (rows['agreement'] > agreement)
+		rows['passed'] = rows['failed'] == 0
+	return(result)
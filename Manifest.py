@@ -0,0 +1,197 @@
+#!/usr/bin/python
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import resource
+import threading
+
+def Memory():
+	'''
+	The resident memory (MB) of this process and all of its child
+	processes right now, read from /proc. Returns None where /proc
+	is not available
+	'''
+	try:
+		parents = {}
+		for entry in os.listdir('/proc'):
+			if entry.isdigit():
+				try:
+					with open('/proc/{}/stat'.format(entry)) as TheFile:
+						parents[int(entry)] = int(TheFile.read().rsplit(')', 1)[1].split()[1])
+				except OSError:
+					continue
+	except OSError:
+		return(None)
+	family = [os.getpid()]
+	for pid in family:
+		family.extend(child for child, parent in parents.items() if parent == pid)
+	total = 0
+	for pid in family:
+		try:
+			with open('/proc/{}/statm'.format(pid)) as TheFile:
+				total += int(TheFile.read().split()[1]) * resource.getpagesize()
+		except OSError:
+			continue
+	return(total / 1024 ** 2)
+
+class Sampler():
+	'''
+	Samples Memory() in a background thread while a stage runs and
+	keeps the highest value, the peak resident memory of the stage
+	itself (its worker processes included) rather than of the whole
+	run so far
+	'''
+	def __init__(self, interval=0.2):
+		self.interval = interval
+		self.peak = Memory()
+		self.stop = threading.Event()
+		self.thread = threading.Thread(target=self.Sample, daemon=True)
+
+	def __enter__(self):
+		self.thread.start()
+		return(self)
+
+	def __exit__(self, *error):
+		self.stop.set()
+		self.thread.join()
+
+	def Sample(self):
+		while not self.stop.wait(self.interval):
+			memory = Memory()
+			if memory is not None:
+				self.peak = max(self.peak or 0.0, memory)
+
+class Manifest():
+	'''
+	Records which stages of the dataset pipeline have finished and
+	the pass/fail verdict of every file in each stage, in an SQLite
+	database. Every verdict is committed as soon as it is recorded,
+	so when the pipeline is killed at any point only the files that
+	were being processed at that moment are lost, and a rerun skips
+	finished stages and already processed files
+	'''
+	def __init__(self, filename='Pipeline.db'):
+		self.filename = filename
+		self.db = sqlite3.connect(filename)
+		self.db.execute('PRAGMA journal_mode=WAL')
+		self.db.execute('PRAGMA synchronous=NORMAL')
+		self.db.execute('CREATE TABLE IF NOT EXISTS stages (stage TEXT PRIMARY KEY, finished REAL)')
+		self.db.execute('CREATE TABLE IF NOT EXISTS verdicts (stage TEXT, file TEXT, verdict TEXT, reason TEXT, recorded REAL, PRIMARY KEY (stage, file))')
+		if 'recorded' not in [row[1] for row in self.db.execute('PRAGMA table_info(verdicts)')]:
+			self.db.execute('ALTER TABLE verdicts ADD COLUMN recorded REAL')
+		self.db.execute('CREATE TABLE IF NOT EXISTS metrics (stage TEXT PRIMARY KEY, started REAL, wall REAL, cpu REAL, rss REAL, files_in INTEGER, files_out INTEGER)')
+		self.db.execute('CREATE TABLE IF NOT EXISTS snapshot (entry TEXT PRIMARY KEY, size INTEGER, mtime REAL)')
+		self.db.commit()
+
+	def Done(self, stage):
+		''' Whether a stage has already finished '''
+		return(self.db.execute('SELECT 1 FROM stages WHERE stage=?', (stage,)).fetchone() is not None)
+
+	def Finish(self, stage):
+		''' Mark a stage as finished '''
+		with self.db:
+			self.db.execute('INSERT OR REPLACE INTO stages VALUES (?, ?)', (stage, time.time()))
+
+	def Processed(self, stage):
+		''' The set of files that already have a verdict in a stage '''
+		return({row[0] for row in self.db.execute('SELECT file FROM verdicts WHERE stage=?', (stage,))})
+
+	def Record(self, stage, filename, reason=None):
+		''' Record a file's verdict in a stage, a reason means the file failed '''
+		with self.db:
+			self.db.execute('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)', (stage, filename, 'pass' if reason is None else 'fail', reason, time.time()))
+
+	def Verdicts(self, stage):
+		''' The (file, verdict, reason) of every file in a stage '''
+		return(self.db.execute('SELECT file, verdict, reason FROM verdicts WHERE stage=?', (stage,)).fetchall())
+
+	def Run(self, stage, function, *args, **kwargs):
+		'''
+		Run a stage unless it already finished in an earlier run, and
+		record its wall time, CPU time (including worker processes),
+		and peak memory (sampled while the stage runs, worker processes
+		included). The files in and out are the verdicts recorded by
+		this run of the stage, so a resumed stage does not count the
+		files an earlier run processed, or for stages without verdicts
+		the number of files in the directory given as the first
+		argument before and after the stage
+		'''
+		if self.Done(stage):
+			print('\x1b[33m' + 'Skipping {}, already finished'.format(stage) + '\x1b[0m')
+			return
+		directory = args[0] if args != () and isinstance(args[0], str) and os.path.isdir(args[0]) else None
+		before = len(os.listdir(directory)) if directory is not None else None
+		started = time.time()
+		wall = time.perf_counter()
+		cpu = self.CPU()
+		with Sampler() as sampler:
+			function(*args, **kwargs)
+		wall = time.perf_counter() - wall
+		cpu = self.CPU() - cpu
+		rss = sampler.peak
+		if rss is None:													#No /proc, fall back to the high-water mark of the whole run
+			rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+		verdicts = self.db.execute('SELECT COUNT(*), COALESCE(SUM(recorded>=?), 0), COALESCE(SUM(recorded>=? AND verdict=\'pass\'), 0) FROM verdicts WHERE stage=?', (started, started, stage)).fetchone()
+		if verdicts[0] > 0:
+			files_in, files_out = verdicts[1], verdicts[2]
+		else:
+			files_in = before
+			files_out = len(os.listdir(directory)) if directory is not None and os.path.isdir(directory) else None
+		with self.db:
+			self.db.execute('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?)', (stage, started, wall, cpu, rss, files_in, files_out))
+		self.Finish(stage)
+
+	def CPU(self):
+		''' User and system CPU seconds of this process and its finished child processes '''
+		own = resource.getrusage(resource.RUSAGE_SELF)
+		children = resource.getrusage(resource.RUSAGE_CHILDREN)
+		return(own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime)
+
+	def Rejections(self, stage):
+		''' The number of files each reason removed in a stage '''
+		return(dict(self.db.execute('SELECT reason, COUNT(*) FROM verdicts WHERE stage=? AND verdict=\'fail\' GROUP BY reason ORDER BY COUNT(*) DESC', (stage,)).fetchall()))
+
+	def Report(self, filename='report'):
+		'''
+		Write the metrics of every stage that ran to filename.json and
+		filename.csv: wall and CPU seconds, files per second, peak
+		resident memory of the stage (MB, worker processes included),
+		files in and out, and the number of files each rejection reason
+		removed
+		'''
+		stages = []
+		for stage, started, wall, cpu, rss, files_in, files_out in self.db.execute('SELECT * FROM metrics ORDER BY started').fetchall():
+			stages.append({'stage':stage, 'started':started, 'wall':wall, 'cpu':cpu, 'files_per_sec':files_in / wall if files_in and wall > 0 else None, 'peak_rss_mb':rss, 'files_in':files_in, 'files_out':files_out, 'rejections':self.Rejections(stage)})
+		with open(filename + '.json', 'w') as TheFile:
+			json.dump(stages, TheFile, indent=1)
+		with open(filename + '.csv', 'w', newline='') as TheFile:
+			writer = csv.writer(TheFile)
+			writer.writerow(['stage', 'wall', 'cpu', 'files_per_sec', 'peak_rss_mb', 'files_in', 'files_out', 'rejections'])
+			for row in stages:
+				writer.writerow([row['stage'], round(row['wall'], 3), round(row['cpu'], 3), None if row['files_per_sec'] is None else round(row['files_per_sec'], 3), round(row['peak_rss_mb'], 1), row['files_in'], row['files_out'], ' '.join('{}={}'.format(reason, number) for reason, number in row['rejections'].items())])
+		return(stages)
+
+	def Reset(self, stage):
+		''' Forget a stage and all of its verdicts, so it runs again '''
+		with self.db:
+			self.db.execute('DELETE FROM stages WHERE stage=?', (stage,))
+			self.db.execute('DELETE FROM verdicts WHERE stage=?', (stage,))
+			self.db.execute('DELETE FROM metrics WHERE stage=?', (stage,))
+
+	def Forget(self, prefix):
+		''' Forget the verdicts of every file that starts with a prefix, in every stage '''
+		with self.db:
+			self.db.execute('DELETE FROM verdicts WHERE substr(file, 1, ?)=?', (len(prefix), prefix))
+
+	def Snapshot(self):
+		''' The {entry: (size, mtime)} of the mirror at the last update '''
+		return({row[0]:(row[1], row[2]) for row in self.db.execute('SELECT entry, size, mtime FROM snapshot')})
+
+	def Stamp(self, entries):
+		''' Replace the stored snapshot with a new {entry: (size, mtime)} '''
+		with self.db:
+			self.db.execute('DELETE FROM snapshot')
+			self.db.executemany('INSERT INTO snapshot VALUES (?, ?, ?)', [(entry, size, mtime) for entry, (size, mtime) in entries.items()])
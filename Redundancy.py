@@ -0,0 +1,225 @@
+#!/usr/bin/python
+
+import contextlib
+import numpy as np
+import multiprocessing
+import Bio.PDB
+import Bio.pairwise2
+import Geometry
+import Archive
+
+# Arrays shared with the pool workers
+Shared = {}
+
+def Source(source):
+	''' A file path for a structure given either as a file name or as a (store location, key) pair '''
+	if isinstance(source, tuple):
+		return(Archive.Local(*source))
+	return(contextlib.nullcontext(source))
+
+def Trace(filename):
+	''' The CA trace of one structure, empty if the file cannot be read '''
+	try:
+		with Source(filename) as path:
+			xyz, element, name, resseq = Geometry.Atoms(path)
+		return(Geometry.CA(xyz, element, name, resseq))
+	except Exception:
+		return(np.zeros((0, 3)))
+
+def LoadCA(filenames, cores=None):
+	'''
+	Load every structure's CA trace once into a zero padded
+	(structures, residues, 3) float32 array. Returns the array
+	and the number of residues of each structure
+	'''
+	with multiprocessing.Pool(cores) as pool:
+		traces = pool.map(Trace, filenames, chunksize=64)
+	lengths = np.array([len(trace) for trace in traces], dtype=np.int64)
+	CA = np.zeros((len(traces), max(lengths.max(initial=0), 1), 3), dtype=np.float32)
+	for i, trace in enumerate(traces):
+		CA[i, :len(trace)] = trace
+	return(CA, lengths)
+
+def Prefix(CA):
+	'''
+	Cumulative sums of the coordinates and the squared coordinates,
+	so the centroid and Rg of any N-terminal prefix of a structure
+	can be looked up in constant time
+	'''
+	X = CA.astype(np.float64)
+	return(np.cumsum(X, axis=1), np.cumsum((X ** 2).sum(axis=2), axis=1))
+
+def Kabsch(A, B, k):
+	'''
+	Minimum RMSD after optimal superposition of a batch of coordinate
+	pairs. A and B are (pairs, residues, 3) arrays of which only the
+	first k[p] residues of pair p are used
+	'''
+	mask = (np.arange(A.shape[1])[None, :] < k[:, None])[:, :, None]
+	A = A * mask
+	B = B * mask
+	A = (A - A.sum(axis=1, keepdims=True) / k[:, None, None]) * mask		#Center on the centroid of the compared residues
+	B = (B - B.sum(axis=1, keepdims=True) / k[:, None, None]) * mask
+	H = np.einsum('pli,plj->pij', A, B)
+	U, S, Vt = np.linalg.svd(H)
+	d = np.sign(np.linalg.det(U) * np.linalg.det(Vt))				#Avoid reflections
+	S[:, 2] *= d
+	E = (A ** 2).sum(axis=(1, 2)) + (B ** 2).sum(axis=(1, 2)) - 2 * S.sum(axis=1)
+	return(np.sqrt(np.maximum(E, 0.0) / k))
+
+def Initialise(CA, lengths, cutoff, lengthdiff, batch):
+	''' Store the shared arrays in each pool worker '''
+	Shared['CA'] = CA
+	Shared['lengths'] = lengths
+	Shared['S1'], Shared['S2'] = Prefix(CA)
+	Shared['cutoff'] = cutoff
+	Shared['lengthdiff'] = lengthdiff
+	Shared['batch'] = batch
+
+def Tile(bounds):
+	'''
+	Compare every structure of one block of rows against every
+	structure of one block of columns. Pairs whose lengths differ
+	too much, or whose prefix Rg values differ by more than the
+	cutoff (a lower bound of the RMSD), are pruned before the
+	superposition. Returns the (i, j, RMSD) of all pairs below the
+	cutoff
+	'''
+	r0, r1, c0, c1 = bounds
+	CA, lengths, S1, S2 = Shared['CA'], Shared['lengths'], Shared['S1'], Shared['S2']
+	cutoff = Shared['cutoff']
+	I, J = np.meshgrid(np.arange(r0, r1), np.arange(c0, c1), indexing='ij')
+	I, J = I.ravel(), J.ravel()
+	keep = (I < J) & (lengths[I] > 2) & (lengths[J] > 2)
+	if Shared['lengthdiff'] is not None:
+		keep &= np.abs(lengths[I] - lengths[J]) <= Shared['lengthdiff']
+	I, J = I[keep], J[keep]
+	k = np.minimum(lengths[I], lengths[J])
+	RgI = np.sqrt(np.maximum(S2[I, k - 1] / k - ((S1[I, k - 1] / k[:, None]) ** 2).sum(axis=1), 0.0))
+	RgJ = np.sqrt(np.maximum(S2[J, k - 1] / k - ((S1[J, k - 1] / k[:, None]) ** 2).sum(axis=1), 0.0))
+	keep = np.abs(RgI - RgJ) < cutoff
+	I, J, k = I[keep], J[keep], k[keep]
+	edges = []
+	for start in range(0, len(I), Shared['batch']):
+		i, j, n = I[start:start + Shared['batch']], J[start:start + Shared['batch']], k[start:start + Shared['batch']]
+		width = n.max()
+		rmsd = Kabsch(CA[i, :width].astype(np.float64), CA[j, :width].astype(np.float64), n)
+		below = rmsd < cutoff
+		edges.append(np.stack([i[below], j[below], rmsd[below]], axis=1))
+	if edges == []:
+		return(np.zeros((0, 3)))
+	return(np.concatenate(edges))
+
+def Greedy(size, edges):
+	'''
+	Greedy clustering over a list of (i, j, distance) edges. Going
+	through the structures in order, each structure that is not yet
+	assigned becomes a representative and claims all of its
+	unassigned neighbours. Returns the representative of each
+	structure and the distance to it
+	'''
+	neighbours = [[] for i in range(size)]
+	for i, j, distance in edges:
+		neighbours[int(i)].append((int(j), distance))
+		neighbours[int(j)].append((int(i), distance))
+	representative = np.full(size, -1, dtype=np.int64)
+	distances = np.zeros(size)
+	for i in range(size):
+		if representative[i] != -1:
+			continue
+		representative[i] = i
+		for j, distance in neighbours[i]:
+			if representative[j] == -1:
+				representative[j] = i
+				distances[j] = distance
+	return(representative, distances)
+
+def Structures(filenames, cutoff, lengthdiff=None, tile=256, batch=4096, cores=None):
+	'''
+	All-vs-all CA RMSD redundancy clustering. Each pair is compared
+	over the length of the shorter structure, the work is split
+	into tiles of the pair matrix and spread across a process pool.
+	Returns the representative index and the RMSD to it for each
+	structure
+	'''
+	CA, lengths = LoadCA(filenames, cores)
+	tiles = [(r, min(r + tile, len(filenames)), c, min(c + tile, len(filenames))) for r in range(0, len(filenames), tile) for c in range(r, len(filenames), tile)]
+	edges = []
+	with multiprocessing.Pool(cores, initializer=Initialise, initargs=(CA, lengths, cutoff, lengthdiff, batch)) as pool:
+		for result in pool.imap_unordered(Tile, tiles):
+			edges.append(result)
+	edges = np.concatenate(edges) if edges != [] else np.zeros((0, 3))
+	edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))] if len(edges) else edges
+	return(Greedy(len(filenames), edges))
+
+def Sequence(filename):
+	''' The sequence of the first peptide of one structure, empty if there is none '''
+	try:
+		with Source(filename) as path:
+			structure = Bio.PDB.PDBParser(QUIET=True).get_structure('X', path)
+		return(str(Bio.PDB.Polypeptide.PPBuilder().build_peptides(structure, aa_only=True)[0].get_sequence()))
+	except Exception:
+		return('')
+
+def MinHash(sequence, k, a, b, prime=2147483647):
+	'''
+	MinHash signature of the set of k-mers of a sequence, one value
+	for each (a, b) hash function
+	'''
+	codes = np.frombuffer(sequence.encode(), dtype=np.uint8).astype(np.int64) - 65
+	if len(codes) < k:
+		return(np.full(len(a), prime, dtype=np.int64))
+	kmers = np.unique(np.lib.stride_tricks.sliding_window_view(codes, k) @ (26 ** np.arange(k)))
+	return(((a[:, None] * kmers[None, :] + b[:, None]) % prime).min(axis=1))
+
+def Candidates(signatures, bands):
+	'''
+	Locality sensitive hashing of the MinHash signatures. Sequences
+	that share all values of at least one band are candidate pairs
+	'''
+	rows = signatures.shape[1] // bands
+	pairs = set()
+	for band in range(bands):
+		buckets = {}
+		for i, signature in enumerate(signatures):
+			buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+		for members in buckets.values():
+			for x in range(len(members)):
+				for y in range(x + 1, len(members)):
+					pairs.add((members[x], members[y]))
+	return(sorted(pairs))
+
+def Align(pair):
+	''' Percentage identity of the global alignment of two shared sequences '''
+	i, j = pair
+	alignment = Bio.pairwise2.align.globalxx(Shared['sequences'][i], Shared['sequences'][j], one_alignment_only=True)
+	return(i, j, (alignment[0][2] * 100) / alignment[0][4])
+
+def Share(sequences):
+	''' Store the sequences in each pool worker '''
+	Shared['sequences'] = sequences
+
+def Sequences(filenames, cutoff, k=3, hashes=64, bands=32, seed=0, cores=None):
+	'''
+	Sequence redundancy clustering. Each sequence is extracted once,
+	candidate pairs are found with a MinHash index of k-mers, and
+	only those pairs are aligned exactly, across a process pool.
+	Returns the representative index and the percentage identity
+	to it for each structure
+	'''
+	with multiprocessing.Pool(cores) as pool:
+		sequences = pool.map(Sequence, filenames, chunksize=64)
+	rng = np.random.RandomState(seed)
+	a = rng.randint(1, 2147483647, size=hashes).astype(np.int64)
+	b = rng.randint(0, 2147483647, size=hashes).astype(np.int64)
+	signed = np.array([i for i, sequence in enumerate(sequences) if len(sequence) >= k], dtype=np.int64)	#Empty and shorter than k sequences would all share one signature and bucket
+	signatures = np.array([MinHash(sequences[i], k, a, b) for i in signed]).reshape(len(signed), hashes)
+	pairs = [(int(signed[i]), int(signed[j])) for i, j in Candidates(signatures, bands)]
+	edges = []
+	with multiprocessing.Pool(cores, initializer=Share, initargs=(sequences,)) as pool:
+		for i, j, percentage in pool.imap(Align, pairs, chunksize=256):
+			if percentage > cutoff:
+				edges.append((i, j, percentage))
+	representative, identity = Greedy(len(filenames), edges)
+	identity[representative == np.arange(len(filenames))] = 100.0
+	return(representative, identity)
@@ -0,0 +1,347 @@
+#!/usr/bin/python
+
+import time
+import numpy as np
+import Bio.PDB
+from Bio.PDB.DSSP import residue_max_acc
+from Bio.Data.IUPACData import protein_letters_3to1
+
+# Version of this engine, cached entries are stored under it
+Version = 'numpy-1'
+# Atomic radii (Angstrom) of the backbone atoms, every other atom is side chain
+Radii = {'N':1.65, 'CA':1.87, 'C':1.76, 'O':1.4}
+SideChain = 1.8
+Water = 1.4
+# Hydrogen bond energy constants (kcal/mol)
+Coupling = 27.888								# 0.42 * 0.20 * 332
+MaxEnergy = -0.5
+MinEnergy = -9.9
+MinDistance = 0.5
+MaxCADistance = 9.0
+
+def Read(filename):
+	'''
+	Read the protein residues of the first model of a PDB file in one
+	pass. Residues without all four backbone atoms are dropped.
+	Returns the (residues, 4, 3) N, CA, C, O backbone, the residue
+	names, the chain of every residue, the (atoms, 3) coordinates of
+	all heavy atoms, their names, and the residue index of each atom
+	'''
+	residues = {}
+	order = []
+	with open(filename, 'r') as TheFile:
+		for line in TheFile:
+			if line.startswith('ATOM'):
+				if line[16] not in ' A':								#Only the first alternate location
+					continue
+				name = line[12:16].strip()
+				element = line[76:78].strip() or name.lstrip('0123456789')[:1]
+				if element.upper() in ('H', 'D'):
+					continue
+				key = (line[21], line[22:27])
+				if key not in residues:
+					residues[key] = (line[17:20].strip(), {})
+					order.append(key)
+				atoms = residues[key][1]
+				if name not in atoms:
+					atoms[name] = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+			elif line.startswith('ENDMDL'):
+				break
+	order = [key for key in order if all(atom in residues[key][1] for atom in ('N', 'CA', 'C', 'O'))]
+	backbone = np.array([[residues[key][1][atom] for atom in ('N', 'CA', 'C', 'O')] for key in order], dtype=np.float64).reshape(-1, 4, 3)
+	resname = np.array([residues[key][0] for key in order])
+	chain = np.array([key[0] for key in order])
+	xyz, names, residue = [], [], []
+	for index, key in enumerate(order):
+		for name, coordinates in residues[key][1].items():
+			if name == 'OXT':
+				continue
+			xyz.append(coordinates)
+			names.append(name)
+			residue.append(index)
+	return(backbone, resname, chain, np.array(xyz, dtype=np.float64).reshape(-1, 3), np.array(names), np.array(residue, dtype=np.int64))
+
+def Breaks(backbone, chain):
+	''' Whether each residue starts a new segment, a new chain or a C-N distance above 2.5 A to the previous residue '''
+	breaks = np.ones(len(backbone), dtype=bool)
+	if len(backbone) > 1:
+		gap = np.linalg.norm(backbone[1:, 0] - backbone[:-1, 2], axis=1)
+		breaks[1:] = (gap > 2.5) | (chain[1:] != chain[:-1])
+	return(breaks)
+
+def Hydrogens(backbone, breaks):
+	''' Amide hydrogen positions, placed 1 A from N opposite to the previous residue's C=O '''
+	H = backbone[:, 0].copy()
+	CO = backbone[:-1, 2] - backbone[:-1, 3]
+	CO /= np.linalg.norm(CO, axis=1, keepdims=True)
+	H[1:] += np.where(breaks[1:, None], 0.0, CO)
+	return(H)
+
+def Energies(backbone, proline, breaks):
+	'''
+	Kabsch-Sander electrostatic hydrogen bond energy of every
+	(donor N-H, acceptor C=O) pair of residues, as a (donor, acceptor)
+	matrix. Pairs whose CA atoms are further than 9 A apart, proline
+	donors, and each residue's bond to itself and from the next
+	residue are 0
+	'''
+	n = len(backbone)
+	H = Hydrogens(backbone, breaks)
+	N, CA, C, O = backbone[:, 0], backbone[:, 1], backbone[:, 2], backbone[:, 3]
+	def distance(a, b):
+		return(np.linalg.norm(a[:, None, :] - b[None, :, :], axis=2))
+	dON, dCH, dOH, dCN = distance(N, O), distance(H, C), distance(H, O), distance(N, C)
+	with np.errstate(divide='ignore'):
+		E = Coupling * (1 / dON + 1 / dCH - 1 / dOH - 1 / dCN)
+	close = (dON < MinDistance) | (dCH < MinDistance) | (dOH < MinDistance) | (dCN < MinDistance)
+	E = np.where(close, MinEnergy, np.maximum(np.round(E, 3), MinEnergy))
+	E[distance(CA, CA) >= MaxCADistance] = 0.0
+	E[proline] = 0.0
+	E[np.arange(n), np.arange(n)] = 0.0
+	E[np.arange(1, n), np.arange(n - 1)] = 0.0
+	return(E)
+
+def Bonds(E):
+	''' The hydrogen bonds, a donor bonds to an acceptor if it is one of the donor's two lowest energy acceptors and below -0.5 kcal/mol '''
+	bonds = np.zeros(E.shape, dtype=bool)
+	if len(E) < 2:
+		return(bonds)
+	best = np.argsort(E, axis=1, kind='stable')[:, :2]
+	rows = np.arange(len(E))[:, None]
+	bonds[rows, best] = E[rows, best] < MaxEnergy
+	return(bonds)
+
+def Ladders(bonds, segment):
+	'''
+	Beta bridges of every residue pair, grouped into ladders of
+	consecutive bridges which are then joined across beta bulges.
+	Returns a list of [type, i residues, j residues] ladders
+	'''
+	n = len(bonds)
+	def bond(donor, acceptor):
+		return(bonds[donor, acceptor])
+	ladders = []
+	for i in range(1, n - 4):
+		for j in range(i + 3, n - 1):
+			if segment[i - 1] != segment[i + 1] or segment[j - 1] != segment[j + 1]:
+				continue
+			a, b, c, d, e, f = i - 1, i, i + 1, j - 1, j, j + 1
+			if (bond(c, e) and bond(e, a)) or (bond(f, b) and bond(b, d)):
+				kind = 'parallel'
+			elif (bond(c, d) and bond(f, a)) or (bond(e, b) and bond(b, e)):
+				kind = 'antiparallel'
+			else:
+				continue
+			for ladder in ladders:
+				if ladder[0] != kind or i != ladder[1][-1] + 1 or segment[i] != segment[ladder[1][-1]]:
+					continue
+				if kind == 'parallel' and ladder[2][-1] + 1 == j:
+					ladder[1].append(i)
+					ladder[2].append(j)
+					break
+				if kind == 'antiparallel' and ladder[2][0] - 1 == j:
+					ladder[1].append(i)
+					ladder[2].insert(0, j)
+					break
+			else:
+				ladders.append([kind, [i], [j]])
+	ladders.sort(key=lambda ladder: (ladder[1][0], ladder[2][0]))
+	merged = True
+	while merged:													#Join ladders separated by a bulge
+		merged = False
+		for x in range(len(ladders)):
+			for y in range(x + 1, len(ladders)):
+				kind, ix, jx = ladders[x]
+				other, iy, jy = ladders[y]
+				gap = iy[0] - ix[-1]
+				if kind != other or gap <= 0 or gap >= 6:
+					continue
+				strand = jy[0] - jx[-1] if kind == 'parallel' else jx[0] - jy[-1]
+				if strand > 0 and ((strand < 6 and gap < 3) or strand < 3):
+					ladders[x] = [kind, ix + iy, sorted(jx + jy)]
+					del ladders[y]
+					merged = True
+					break
+			if merged:
+				break
+	return(ladders)
+
+def Structure(backbone, breaks, bonds):
+	'''
+	DSSP secondary structure codes (H, B, E, G, I, T, S, or -) of each
+	residue from the hydrogen bonds and the CA trace
+	'''
+	n = len(backbone)
+	segment = np.cumsum(breaks)
+	ss = np.full(n, '-')
+	turns = {}
+	for stride in (3, 4, 5):
+		i = np.arange(max(n - stride, 0))
+		turns[stride] = np.zeros(n, dtype=bool)
+		turns[stride][i] = bonds[i + stride, i] & (segment[i] == segment[i + stride])
+	for kind, I, J in Ladders(bonds, segment):
+		code = 'E' if len(I) > 1 else 'B'
+		for residues in (range(I[0], I[-1] + 1), range(min(J), max(J) + 1)):
+			for r in residues:
+				if ss[r] != 'E':
+					ss[r] = code
+	for i in range(1, n - 4):
+		if turns[4][i] and turns[4][i - 1]:
+			ss[i:i + 4] = 'H'
+	for stride, code in ((3, 'G'), (5, 'I')):
+		for i in range(1, n - stride):
+			if turns[stride][i] and turns[stride][i - 1] and np.all((ss[i:i + stride] == '-') | (ss[i:i + stride] == code)):
+				ss[i:i + stride] = code
+	bend = np.zeros(n, dtype=bool)
+	if n > 4:
+		CA = backbone[:, 1]
+		u = CA[2:-2] - CA[:-4]
+		v = CA[4:] - CA[2:-2]
+		cosine = (u * v).sum(axis=1) / (np.linalg.norm(u, axis=1) * np.linalg.norm(v, axis=1))
+		kappa = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+		bend[2:-2] = (kappa > 70) & (segment[:-4] == segment[4:])
+	for i in range(1, n - 1):
+		if ss[i] != '-':
+			continue
+		if any(i >= k and turns[stride][i - k] for stride in (3, 4, 5) for k in range(1, stride)):
+			ss[i] = 'T'
+		elif bend[i]:
+			ss[i] = 'S'
+	return(ss)
+
+def Dihedral(p0, p1, p2, p3):
+	''' Dihedral angles (degrees) of arrays of four points '''
+	b0, b1, b2 = p0 - p1, p2 - p1, p3 - p2
+	b1 = b1 / np.linalg.norm(b1, axis=-1, keepdims=True)
+	v = b0 - (b0 * b1).sum(axis=-1, keepdims=True) * b1
+	w = b2 - (b2 * b1).sum(axis=-1, keepdims=True) * b1
+	x = (v * w).sum(axis=-1)
+	y = (np.cross(b1, v) * w).sum(axis=-1)
+	return(np.degrees(np.arctan2(y, x)))
+
+def Torsions(backbone, breaks):
+	''' Phi and psi angles of each residue, 360 where they are undefined '''
+	n = len(backbone)
+	phi = np.full(n, 360.0)
+	psi = np.full(n, 360.0)
+	if n > 1:
+		N, CA, C = backbone[:, 0], backbone[:, 1], backbone[:, 2]
+		linked = ~breaks[1:]
+		phi[1:] = np.where(linked, Dihedral(C[:-1], N[1:], CA[1:], C[1:]), 360.0)
+		psi[:-1] = np.where(linked, Dihedral(N[:-1], CA[:-1], C[:-1], N[1:]), 360.0)
+	return(np.round(phi, 1), np.round(psi, 1))
+
+def Omega(backbone, breaks):
+	''' Omega angle of each residue (CA, C, next N, next CA), 360 where it is undefined '''
+	omega = np.full(len(backbone), 360.0)
+	if len(backbone) > 1:
+		N, CA, C = backbone[:, 0], backbone[:, 1], backbone[:, 2]
+		omega[:-1] = np.where(~breaks[1:], Dihedral(CA[:-1], C[:-1], N[1:], CA[1:]), 360.0)
+	return(np.round(omega, 1))
+
+def Sphere(points=200):
+	''' Evenly spaced points on a unit sphere (golden spiral) '''
+	i = np.arange(points) + 0.5
+	z = 1 - 2 * i / points
+	theta = np.pi * (1 + 5 ** 0.5) * i
+	r = np.sqrt(1 - z ** 2)
+	return(np.stack([r * np.cos(theta), r * np.sin(theta), z], axis=1))
+
+def Accessibility(xyz, names, residue, size, points=200, block=64):
+	'''
+	Shrake-Rupley solvent accessible surface area of each residue.
+	Every atom's sphere of test points is checked against all of its
+	neighbouring atoms at once, a block of atoms at a time
+	'''
+	radius = np.array([Radii.get(name, SideChain) for name in names]) + Water
+	sphere = Sphere(points)
+	area = np.zeros(len(xyz))
+	for start in range(0, len(xyz), block):
+		stop = min(start + block, len(xyz))
+		d = np.linalg.norm(xyz[start:stop, None, :] - xyz[None, :, :], axis=2)
+		near = d < radius[start:stop, None] + radius[None, :]
+		near[np.arange(stop - start), np.arange(start, stop)] = False
+		width = max(int(near.sum(axis=1).max(initial=0)), 1)
+		index = np.argsort(~near, axis=1, kind='stable')[:, :width]			#Neighbours first
+		valid = np.take_along_axis(near, index, axis=1)
+		dots = xyz[start:stop, None, :] + radius[start:stop, None, None] * sphere[None, :, :]
+		gap = ((dots[:, :, None, :] - xyz[index][:, None, :, :]) ** 2).sum(axis=3)
+		buried = ((gap < radius[index][:, None, :] ** 2) & valid[:, None, :]).any(axis=2)
+		area[start:stop] = (~buried).mean(axis=1) * 4 * np.pi * radius[start:stop] ** 2
+	return(np.bincount(residue, weights=area, minlength=size))
+
+def Assign(backbone, resname, chain, xyz, names, residue, acc_array='Wilke'):
+	'''
+	Compute the DSSP output from coordinate arrays. Returns a list of
+	(residue number, amino acid, secondary structure, relative ASA,
+	phi, psi) tuples, the same as Cache.DSSP and Bio.PDB.DSSP
+	'''
+	n = len(backbone)
+	if n == 0:
+		return([])
+	breaks = Breaks(backbone, chain)
+	bonds = Bonds(Energies(backbone, resname == 'PRO', breaks))
+	ss = Structure(backbone, breaks, bonds)
+	phi, psi = Torsions(backbone, breaks)
+	asa = Accessibility(xyz, names, residue, n)
+	number = np.arange(n) + np.cumsum(breaks)						#DSSP numbers each break as a residue
+	table = residue_max_acc[acc_array]
+	residues = []
+	for i in range(n):
+		relative = float(asa[i] / table[resname[i]]) if resname[i] in table else 'NA'
+		residues.append((int(number[i]), protein_letters_3to1.get(resname[i].capitalize(), 'X'), str(ss[i]), relative, float(phi[i]), float(psi[i])))
+	return(residues)
+
+def DSSP(filename, acc_array='Wilke'):
+	''' In-process replacement for running mkdssp on the first model of a structure file '''
+	return(Assign(*Read(filename), acc_array=acc_array))
+
+def Reference(filename, acc_array='Wilke'):
+	''' The mkdssp output for the same structure file, through Bio.PDB.DSSP '''
+	structure = Bio.PDB.PDBParser(QUIET=True).get_structure('X', filename)
+	return([tuple(aa[:6]) for aa in Bio.PDB.DSSP(structure[0], filename, acc_array=acc_array)])
+
+def Benchmark(filenames, acc_array='Wilke'):
+	''' Time this engine and mkdssp over the same structure files, returns the seconds per structure of each '''
+	times = {}
+	for name, engine in (('numpy', DSSP), ('mkdssp', Reference)):
+		start = time.perf_counter()
+		for filename in filenames:
+			engine(filename, acc_array)
+		times[name] = (time.perf_counter() - start) / max(len(filenames), 1)
+		print('\x1b[32m' + '{}: {:.1f} ms per structure'.format(name, times[name] * 1000) + '\x1b[0m')
+	return(times)
+
+def Agreement(filenames, acc_array='Wilke'):
+	'''
+	Compare this engine to mkdssp over the same structure files.
+	Reports the fraction of residues with the same 8-state code and
+	the same 3-state (H, S, L) code, and the mean absolute relative
+	ASA, phi, and psi differences
+	'''
+	three = {'H':'H', 'G':'H', 'I':'H', 'E':'S', 'B':'S'}
+	counts = {'residues':0, 'structures':0, 'Q8':0, 'Q3':0, 'ASA':0.0, 'phi':0.0, 'psi':0.0}
+	for filename in filenames:
+		try:
+			reference = {(aa[0], aa[1]):aa for aa in Reference(filename, acc_array)}
+		except Exception:
+			continue
+		counts['structures'] += 1
+		for aa in DSSP(filename, acc_array):
+			other = reference.get((aa[0], aa[1]))
+			if other is None:
+				continue
+			counts['residues'] += 1
+			counts['Q8'] += aa[2] == other[2]
+			counts['Q3'] += three.get(aa[2], 'L') == three.get(other[2], 'L')
+			if aa[3] != 'NA' and other[3] != 'NA':
+				counts['ASA'] += abs(aa[3] - other[3])
+			for angle, index in (('phi', 4), ('psi', 5)):
+				difference = abs(aa[index] - other[index]) % 360
+				counts[angle] += min(difference, 360 - difference)
+	total = max(counts['residues'], 1)
+	report = {'structures':counts['structures'], 'residues':counts['residues'], 'Q8':counts['Q8'] / total, 'Q3':counts['Q3'] / total, 'ASA':counts['ASA'] / total, 'phi':counts['phi'] / total, 'psi':counts['psi'] / total}
+	print('\x1b[32m' + 'Compared {} residues of {} structures'.format(report['residues'], report['structures']) + '\x1b[0m')
+	print('\x1b[32m' + '8-state agreement: {:.1%}, 3-state agreement: {:.1%}'.format(report['Q8'], report['Q3']) + '\x1b[0m')
+	print('\x1b[32m' + 'Mean absolute difference, relative ASA: {:.3f}, phi: {:.1f}, psi: {:.1f}'.format(report['ASA'], report['phi'], report['psi']) + '\x1b[0m')
+	return(report)
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+
+import os
+import multiprocessing
+import multiprocessing.connection
+
+def Serve(connection, function, initializer, initargs):
+	''' Worker loop, build the warm state once then run tasks until told to stop '''
+	if initializer is not None:
+		initializer(*initargs)
+	while True:
+		task = connection.recv()
+		if task is None:
+			break
+		try:
+			connection.send((function(task), None))
+		except Exception as TheError:
+			connection.send((None, 'Error: {}'.format(TheError)))
+
+class Supervisor():
+	'''
+	A pool of worker processes that survives workers being killed.
+	Each worker runs the initializer once and then receives one task
+	at a time through its own pipe. When a worker dies (for example
+	a segfault inside PyRosetta, which Python cannot catch) the task
+	it was running is reported as failed, and a new worker with a
+	freshly built state takes its place, so the run continues at
+	full parallelism. With a seed, every worker (restarted ones
+	included) gets its own seed, seed + the number of workers started
+	before it, as the initializer's last argument
+	'''
+	def __init__(self, function, initializer=None, initargs=(), cores=None, seed=None):
+		self.function = function
+		self.initializer = initializer
+		self.initargs = initargs
+		self.cores = cores or os.cpu_count() or 1
+		self.seed = seed
+		self.workers = []
+		self.restarts = 0
+		self.started = 0
+
+	def __enter__(self):
+		return(self)
+
+	def __exit__(self, *error):
+		self.Close()
+
+	def Start(self):
+		''' Start one worker, returns its [process, connection, task in flight] '''
+		parent, child = multiprocessing.Pipe()
+		initargs = tuple(self.initargs) if self.seed is None else tuple(self.initargs) + (self.seed + self.started,)
+		self.started += 1
+		process = multiprocessing.Process(target=Serve, args=(child, self.function, self.initializer, initargs), daemon=True)
+		process.start()
+		child.close()
+		return([process, parent, None])
+
+	def Restart(self, worker):
+		''' Replace a dead worker with a new one that rebuilds the warm state '''
+		worker[0].join()
+		worker[1].close()
+		self.workers.remove(worker)
+		worker = self.Start()
+		self.workers.append(worker)
+		self.restarts += 1
+		return(worker)
+
+	def Map(self, tasks):
+		'''
+		Run the function on every task, yields (task, result, reason)
+		in the order they finish. The reason is None for tasks that
+		succeeded, the exception for tasks that raised one, and the
+		signal for tasks whose worker was killed
+		'''
+		tasks = iter(tasks)
+		end = object()
+		while len(self.workers) < self.cores:
+			self.workers.append(self.Start())
+		idle = list(self.workers)
+		busy = 0
+		while True:
+			while idle != []:
+				task = next(tasks, end)
+				if task is end:
+					break
+				worker = idle.pop()
+				try:
+					worker[1].send(task)
+				except (OSError, ValueError):					#The worker died while idle
+					worker = self.Restart(worker)
+					worker[1].send(task)
+				worker[2] = task
+				busy += 1
+			if busy == 0:
+				return
+			ready = multiprocessing.connection.wait([worker[1] for worker in self.workers if worker[2] is not None] + [worker[0].sentinel for worker in self.workers if worker[2] is not None])
+			for worker in list(self.workers):
+				if worker[2] is None or (worker[1] not in ready and worker[0].sentinel not in ready):
+					continue
+				task = worker[2]
+				try:
+					result, reason = worker[1].recv()
+				except (EOFError, OSError):					#The worker died with the task in flight
+					worker[0].join()
+					code = worker[0].exitcode
+					reason = 'Signal {}'.format(-code) if code is not None and code < 0 else 'Exit {}'.format(code)
+					result = None
+					worker = self.Restart(worker)
+				else:
+					if not worker[0].is_alive():				#Finished the task but died afterwards
+						worker = self.Restart(worker)
+				worker[2] = None
+				idle.append(worker)
+				busy -= 1
+				yield(task, result, reason)
+
+	def Close(self):
+		''' Stop every worker '''
+		for process, connection, task in self.workers:
+			try:
+				connection.send(None)
+			except (OSError, ValueError):
+				pass
+		for process, connection, task in self.workers:
+			process.join(5)
+			if process.is_alive():
+				process.terminate()
+			connection.close()
+		self.workers = []
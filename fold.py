@@ -3,6 +3,9 @@
 import os
 import sys
 import Bio.PDB
+import Cache
+import Geometry
+import numpy as np
 from pyrosetta import *
 from pyrosetta.toolbox import *
 init()
@@ -25,7 +28,7 @@ def FoldPDB_PS(data):
 	relax = pyrosetta.rosetta.protocols.relax.FastRelax(scorefxn)
 	pose.dump_pdb('temp.pdb')
 	structure = Bio.PDB.PDBParser().get_structure('temp', 'temp.pdb')
-	dssp = Bio.PDB.DSSP(structure[0], 'temp.pdb', acc_array='Wilke')
+	dssp = Cache.DSSP('temp.pdb')
 	ppb = Bio.PDB.Polypeptide.PPBuilder()
 	chain = ppb.build_peptides(structure, aa_only=False)[0]
 	SS = []
@@ -60,7 +63,7 @@ def Filter(TheFile):
 	A function that filters protein structures
 	'''
 	structure = Bio.PDB.PDBParser().get_structure('{}'.format(TheFile), TheFile)
-	dssp = Bio.PDB.DSSP(structure[0], TheFile, acc_array='Wilke')
+	dssp = Cache.DSSP(TheFile)
 	ppb = Bio.PDB.Polypeptide.PPBuilder()
 	chain = ppb.build_peptides(structure, aa_only=False)[0]
 	choice = True
@@ -166,6 +169,9 @@ def main(directory):
 		phiout = [x*360.0 for x in phiout]
 		psiout = [x*360.0 for x in psiout]
 		data = (phiout, psiout)
+		#Skip samples that fail the pre-fold screen
+		if not Geometry.Screen(np.array(data).T[None])['passed'][0]:
+			continue
 		FoldPDB_PS(data)
 		Name = TheFile.split('.')[0]
 		os.rename('Backbone.pdb', '{}.pdb'.format(TheFile))
@@ -3,6 +3,9 @@
 import os
 import sys
 import Bio.PDB
+import Cache
+import Geometry
+import numpy as np
 from pyrosetta import *
 from pyrosetta.toolbox import *
 init()
@@ -32,7 +35,7 @@ def FoldPDB_PSC(data):
 	# Adjust End
 	pose.dump_pdb('temp.pdb')
 	structure = Bio.PDB.PDBParser().get_structure('temp', 'temp.pdb')
-	dssp = Bio.PDB.DSSP(structure[0], 'temp.pdb', acc_array='Wilke')
+	dssp = Cache.DSSP('temp.pdb')
 	ppb = Bio.PDB.Polypeptide.PPBuilder()
 	chain = ppb.build_peptides(structure, aa_only=False)[0]
 	SS = []
@@ -83,7 +86,7 @@ def FoldPDB_PSC(data):
 
 def Filter(TheFile):
 	structure = Bio.PDB.PDBParser().get_structure('{}'.format(TheFile), TheFile)
-	dssp = Bio.PDB.DSSP(structure[0], TheFile, acc_array='Wilke')
+	dssp = Cache.DSSP(TheFile)
 	ppb = Bio.PDB.Polypeptide.PPBuilder()
 	chain = ppb.build_peptides(structure, aa_only=False)[0]
 	choice = True
@@ -183,8 +186,11 @@ def main(directory):
 				cstout.append(float(line[2]))
 			phiout = [x*360.0 for x in phiout]
 			psiout = [x*360.0 for x in psiout]
-			psiout = [x*88.731 for x in psiout]
+			cstout = [x*88.731 for x in cstout]
 			data = (phiout, psiout, cstout)
+			#Skip samples that fail the pre-fold screen
+			if not Geometry.Screen(np.array(data).T[None])['passed'][0]:
+				continue
 			FoldPDB_PSC(data)
 			Name = TheFile.split('.')[0]
 			os.rename('Backbone.pdb', '{}.pdb'.format(TheFile))